@@ -0,0 +1,140 @@
+from kubernetes import client, config, watch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json, logging, os, threading, time
+
+logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+PORT=int(os.environ.get('PORT', '8080'))
+NODE_LABEL_SELECTOR=os.environ.get('NODE_LABEL_SELECTOR')
+WATCH_TIMEOUT_SECONDS=int(os.environ.get('WATCH_TIMEOUT_SECONDS', '300'))
+RETRY_DELAY_SECONDS=5
+NODE_GROUP_LABELS=('eks.amazonaws.com/nodegroup', 'karpenter.sh/nodepool', 'alpha.eksctl.io/nodegroup-name')
+ZONE_LABEL='topology.kubernetes.io/zone'
+
+# Readiness of every node kept up to date from a list followed by a watch on
+# nodes, the same way an informer maintains its store
+class NodeCache:
+    def __init__(self, core_v1, label_selector=None):
+        self.core_v1 = core_v1
+        self.label_selector = label_selector
+        self.nodes = dict()
+        self.synced = False
+        self._lock = threading.Lock()
+
+    def run(self):
+        resource_version = None
+        while True:
+            try:
+                if resource_version is None:
+                    resource_version = self._list()
+                resource_version = self._watch(resource_version)
+            except client.exceptions.ApiException as error:
+                # 410 Gone: the resource version is too old to watch from, list again
+                if error.status != 410:
+                    logger.error(f"Watching nodes failed: {error}")
+                    time.sleep(RETRY_DELAY_SECONDS)
+                resource_version = None
+            except Exception as error:
+                logger.error(f"Watching nodes failed: {error}")
+                time.sleep(RETRY_DELAY_SECONDS)
+                resource_version = None
+
+    def _list(self):
+        kwargs = {}
+        if self.label_selector:
+            kwargs['label_selector'] = self.label_selector
+        node_list = self.core_v1.list_node(**kwargs)
+        nodes = {node.metadata.name: _node_state(node) for node in node_list.items}
+        with self._lock:
+            self.nodes = nodes
+            self.synced = True
+        logger.info(f"Listed {len(nodes)} nodes at resource version {node_list.metadata.resource_version}")
+        return node_list.metadata.resource_version
+
+    def _watch(self, resource_version):
+        kwargs = {
+            'resource_version': resource_version,
+            'timeout_seconds': WATCH_TIMEOUT_SECONDS,
+            'allow_watch_bookmarks': True
+        }
+        if self.label_selector:
+            kwargs['label_selector'] = self.label_selector
+        for event in watch.Watch().stream(self.core_v1.list_node, **kwargs):
+            node = event['object']
+            resource_version = node.metadata.resource_version
+            if event['type'] == 'BOOKMARK':
+                continue
+            with self._lock:
+                if event['type'] == 'DELETED':
+                    self.nodes.pop(node.metadata.name, None)
+                else:
+                    self.nodes[node.metadata.name] = _node_state(node)
+        return resource_version
+
+    def snapshot(self):
+        with self._lock:
+            nodes = list(self.nodes.values())
+            synced = self.synced
+        return {
+            'synced': synced,
+            'total': len(nodes),
+            'notReady': sorted((node for node in nodes if not node['ready']), key=lambda node: node['name'])
+        }
+
+def _node_state(node):
+    ready = False
+    not_ready_since = None
+    for condition in (node.status.conditions or []) if node.status else []:
+        if condition.type == 'Ready':
+            ready = condition.status == 'True'
+            if not ready and condition.last_transition_time:
+                not_ready_since = condition.last_transition_time.isoformat()
+    provider_id = node.spec.provider_id if node.spec else None
+    labels = node.metadata.labels or {}
+    return {
+        'name': node.metadata.name,
+        'ready': ready,
+        'notReadySince': not_ready_since,
+        'providerID': provider_id,
+        'instanceId': instance_id_from_provider_id(provider_id),
+        'nodeGroup': next((labels[label] for label in NODE_GROUP_LABELS if label in labels), None),
+        'zone': labels.get(ZONE_LABEL)
+    }
+
+# providerID of EC2 nodes has the form aws:///<availability-zone>/<instance-id>
+def instance_id_from_provider_id(provider_id):
+    if not provider_id or not provider_id.startswith('aws://'):
+        return None
+    instance_id = provider_id.rsplit('/', 1)[-1]
+    return instance_id if instance_id.startswith('i-') else None
+
+def handler_for(cache):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            snapshot = cache.snapshot()
+            if self.path == '/healthz':
+                self._respond(200 if snapshot['synced'] else 503, {'synced': snapshot['synced']})
+            elif self.path == '/nodes':
+                self._respond(200 if snapshot['synced'] else 503, snapshot)
+            else:
+                self._respond(404, {'error': 'not found'})
+
+        def _respond(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+    return Handler
+
+if __name__ == '__main__':
+    config.load_incluster_config()
+    cache = NodeCache(client.CoreV1Api(), NODE_LABEL_SELECTOR)
+    threading.Thread(target=cache.run, daemon=True).start()
+    ThreadingHTTPServer(('', PORT), handler_for(cache)).serve_forever()
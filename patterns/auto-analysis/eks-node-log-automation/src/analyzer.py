@@ -0,0 +1,82 @@
+import json, logging, os, re
+from datetime import datetime, timezone
+import boto3, botocore
+from lib.bundle import analyze
+from lib.correlation import correlate
+from lib.s3 import incident_key, incident_pointer_key, incident_report_key
+
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+ANALYSIS_PREFIX=os.environ.get('ANALYSIS_PREFIX', 'eks_analysis/')
+CORRELATION_BUCKET_SECONDS=int(os.environ.get('CORRELATION_BUCKET_SECONDS', '60'))
+BUNDLE_KEY = re.compile(r'^eks_(i-[0-9a-f]+)_.*\.tar\.gz$')
+
+s3 = boto3.client("s3")
+
+# Triggered by EventBridge when a log bundle is uploaded to the bucket, streams the
+# bundle through the signature scan and writes a JSON summary next to it
+def lambda_handler(event, context):
+    bucket = event['detail']['bucket']['name']
+    key = event['detail']['object']['key']
+    match = BUNDLE_KEY.match(key)
+    if not match:
+        logger.error(f"{key} is not a log bundle, skipping.")
+        return
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+        result = analyze(response['Body'], response['LastModified'].astimezone(timezone.utc))
+        summary = {
+            'bundle': f"s3://{bucket}/{key}",
+            'instanceId': match.group(1),
+            'uploadedAt': response['LastModified'].astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'analyzedAt': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'bundleBytes': response['ContentLength'],
+            **result
+        }
+        summary_key = f"{ANALYSIS_PREFIX}{key[:-len('.tar.gz')]}.json"
+        s3.put_object(Bucket=bucket, Key=summary_key, Body=json.dumps(summary).encode('utf-8'), ContentType='application/json')
+    except botocore.exceptions.ClientError as error:
+        raise error
+    found = ', '.join(f"{signature} ({found['count']})" for signature, found in result['signatures'].items()) or 'no known signatures'
+    logger.info(f"Analyzed {key} of {match.group(1)}: {found}, summary written to s3://{bucket}/{summary_key}")
+    try:
+        correlate_incident(bucket, match.group(1))
+    except Exception as error:
+        logger.error(f"Failed to correlate the incident of {match.group(1)}: {error}")
+    return summary
+
+# When the instance was collected as part of an incident, correlates the summaries
+# of all its nodes analyzed so far. The report is rewritten as every bundle arrives.
+def correlate_incident(bucket, instance_id):
+    pointer = get_json(bucket, incident_pointer_key(instance_id))
+    if pointer is None:
+        return
+    incident = get_json(bucket, incident_key(pointer['incidentId']))
+    started_at = datetime.fromtimestamp(incident['startedAt'], timezone.utc)
+    summaries = dict()
+    for instance in incident['instanceIds']:
+        response = s3.list_objects_v2(Bucket=bucket, Prefix=f"{ANALYSIS_PREFIX}eks_{instance}_")
+        keys = [obj for obj in response.get('Contents', []) if obj['LastModified'] >= started_at]
+        if keys:
+            summaries[instance] = get_json(bucket, max(keys, key=lambda obj: obj['LastModified'])['Key'])
+    report = {
+        'incidentId': incident['incidentId'],
+        'clusterName': incident['clusterName'],
+        'analyzedNodes': sorted(summaries),
+        'pendingNodes': sorted(set(incident['instanceIds']) - set(summaries)),
+        **correlate(summaries, CORRELATION_BUCKET_SECONDS)
+    }
+    report_key = incident_report_key(incident['incidentId'])
+    s3.put_object(Bucket=bucket, Key=report_key, Body=json.dumps(report).encode('utf-8'), ContentType='application/json')
+    logger.info(f"Correlated {len(summaries)} of {len(incident['instanceIds'])} nodes of incident {incident['incidentId']}: {report['scope']}, report written to s3://{bucket}/{report_key}")
+
+def get_json(bucket, key):
+    try:
+        response = s3.get_object(Bucket=bucket, Key=key)
+    except botocore.exceptions.ClientError as error:
+        if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise error
+    else:
+        return json.loads(response['Body'].read())
@@ -1,62 +1,266 @@
-import json, logging, os, math
-from lib.ec2 import get_instances
-from lib.ssm import start_execution
-from lib.kubernetes import KubeAPI
-from lib.s3 import list_bundles_latest
+import json, logging, os, math, time
+from lib.ec2 import get_instances, resolve_instances
+from lib.ssm import start_executions, get_execution_status, ACTIVE_STATUSES
+from lib.kubernetes import get_kube_api
+from lib.eks import get_cluster_vpc
+from lib.s3 import find_bundle, put_marker, marked_since, cluster_marker_key, incident_key, incident_pointer_key
+from lib.executions import open_store as open_execution_store
+from lib.cooldown import open_store as open_cooldown_store
+from lib.nodecache import get_node_scan
+from lib.ranking import rank_nodes
+from lib.routing import get_topic_cluster, alert_cluster
 
 logger = logging.getLogger()
 logger.setLevel("INFO")
 
-CLUSTER_ID=os.environ['CLUSTER_ID']
-CLUSTER_REGION=os.environ['CLUSTER_REGION']
+# Default cluster of the alerts that carry no cluster label and come from an untagged topic
+CLUSTER_ID=os.environ.get('CLUSTER_ID') or None
+CLUSTER_REGION=os.environ.get('CLUSTER_REGION') or os.environ.get('AWS_REGION')
+CLUSTER_LABEL=os.environ.get('CLUSTER_LABEL', 'cluster')
+CLUSTER_REGION_LABEL=os.environ.get('CLUSTER_REGION_LABEL', 'region')
 BUNDLE_RECENCY_SECONDS=int(os.environ['BUNDLE_RECENCY_SECONDS'])
 LOG_COLLECTION_BUCKET=os.environ['LOG_COLLECTION_BUCKET']
 SSM_AUTOMATION_EXECUTION_ROLE_ARN=os.environ['SSM_AUTOMATION_EXECUTION_ROLE_ARN']
+NODE_LIST_PAGE_SIZE=int(os.environ.get('NODE_LIST_PAGE_SIZE', '500'))
+NODE_LABEL_SELECTOR=os.environ.get('NODE_LABEL_SELECTOR')
+NODE_CACHE_URL=os.environ.get('NODE_CACHE_URL')
+SSM_START_RATE=float(os.environ.get('SSM_START_RATE', '5'))
+SSM_START_CONCURRENCY=int(os.environ.get('SSM_START_CONCURRENCY', '5'))
+NODE_COOLDOWN_SECONDS=int(os.environ.get('NODE_COOLDOWN_SECONDS', '1800'))
+REPORT_MAX_EXECUTIONS=int(os.environ.get('REPORT_MAX_EXECUTIONS', '50'))
+REPORT_RESERVE_MILLIS=int(os.environ.get('REPORT_RESERVE_MILLIS', '3000'))
 
 def lambda_handler(event, context):
     try:
-        for record in event['Records']:
-            message = json.loads(record['Sns']['Message'])
-            logger.info(message)
-            alerts = message['alerts']
- 
-        for alert in alerts:
-            if alert['labels']['alertname'] == 'KubeNNR':
-                nnr_execution(alert['labels']['node'])
-            elif alert['labels']['alertname'] == 'KubeNNRMax':
-                kubeapi = KubeAPI(CLUSTER_ID, CLUSTER_REGION)
-                total_nodes_count = kubeapi.get_nodes_count()
-                nodes_max_limit = min(math.ceil(total_nodes_count/5), 5)
-                logger.info(f"The EKS cluster {CLUSTER_ID} in region {CLUSTER_REGION} has more than threshold number of nodes in Not Ready state")
-                not_ready_nodes = kubeapi.list_nodes_notready(nodes_max_limit)
-                nnr_max_execution(not_ready_nodes, nodes_max_limit)
-            else:
-                logger.error("Invalid alert received, skipping.")
+        alerts_by_cluster = collect_alerts(event)
     except Exception as error:
         logger.error(error)
+        alerts_by_cluster = dict()
 
-def nnr_execution(node):
+    # A failure for one cluster does not hold back the alerts of the others
+    for (cluster, region), alerts in alerts_by_cluster.items():
+        try:
+            handle_alerts(cluster, region, alerts)
+        except Exception as error:
+            logger.error(f"Failed to handle the alerts of the EKS cluster {cluster} in region {region}: {error}")
+
+    # Reporting comes after the alerts, with whatever time is left
     try:
-        instances = get_instances([node])
-        for instance in instances:
-            exec_id = start_execution(instance, LOG_COLLECTION_BUCKET, SSM_AUTOMATION_EXECUTION_ROLE_ARN)
-            logger.info(f"EKS Log Collector automation executed for {instance}: {exec_id}")
+        report_executions(context)
+    except Exception as error:
+        logger.error(f"Failed to report automation executions: {error}")
+
+def handle_alerts(cluster, region, alerts):
+    # EC2, SSM and the stores are called in the region of the function, which only
+    # serves the clusters of its region. Other regions need a stack of their own.
+    if os.environ.get('AWS_REGION') and region != os.environ['AWS_REGION']:
+        logger.error(f"The EKS cluster {cluster} is in region {region}, alerts are only handled for clusters in {os.environ['AWS_REGION']}, skipping.")
+        return
+
+    nodes = list()
+    nnr_max = False
+    for alert in alerts:
+        if alert['labels']['alertname'] == 'KubeNNR':
+            if alert['labels']['node'] not in nodes:
+                nodes.append(alert['labels']['node'])
+        elif alert['labels']['alertname'] == 'KubeNNRMax':
+            nnr_max = True
+        else:
+            logger.error("Invalid alert received, skipping.")
+
+    # The circuit breaker handles the individual nodes of the same batch
+    if nnr_max:
+        node_scan = scan_nodes(cluster, region)
+        nodes_max_limit = min(math.ceil(node_scan.total/5), 5)
+        logger.info(f"The EKS cluster {cluster} in region {region} has more than threshold number of nodes in Not Ready state")
+        not_ready_nodes = rank_nodes(
+            node_scan.not_ready,
+            nodes_max_limit,
+            collection_history(node_scan.not_ready),
+            NODE_COOLDOWN_SECONDS
+        )
+        started = nnr_max_execution(cluster, region, not_ready_nodes, nodes_max_limit)
+        # Nodes named by KubeNNR alerts of the same batch are always collected, also
+        # when the ranking leaves them out or the cluster marker holds back the rest
+        if nodes:
+            nnr_execution(cluster, region, nodes, started)
+    elif nodes:
+        nnr_execution(cluster, region, nodes)
+
+# Merges the alerts of every record in the batch and groups them by the cluster
+# and region they were raised for. Records come from SNS directly, or from SQS
+# with the SNS envelope in the body, or the raw message with raw delivery.
+# A malformed record is logged and skipped without dropping the rest of the batch.
+def collect_alerts(event):
+    alerts_by_cluster = dict()
+    for record in event['Records']:
+        try:
+            message, topic_arn = parse_record(record)
+        except Exception as error:
+            logger.error(f"Invalid record received, skipping: {error}")
+            continue
+        logger.info(message)
+        topic_cluster = get_topic_cluster(topic_arn)
+        for alert in message['alerts']:
+            cluster, region = alert_cluster(alert['labels'], CLUSTER_LABEL, CLUSTER_REGION_LABEL, topic_cluster, (CLUSTER_ID, CLUSTER_REGION))
+            if not cluster:
+                logger.error(f"No cluster found for alert {alert['labels'].get('alertname')}, set the {CLUSTER_LABEL} label, tag the topic or set CLUSTER_ID, skipping.")
+                continue
+            alerts_by_cluster.setdefault((cluster, region), list()).append(alert)
+    return alerts_by_cluster
+
+# Returns the Alertmanager message of the record and the topic it was published to
+def parse_record(record):
+    if 'Sns' in record:
+        message = record['Sns']['Message']
+        topic_arn = record['Sns'].get('TopicArn')
+    else:
+        body = json.loads(record['body'])
+        notification = body.get('Type') == 'Notification'
+        message = body['Message'] if notification else record['body']
+        # Raw delivery drops the envelope, and the topic with it
+        topic_arn = body.get('TopicArn') if notification else None
+    message = json.loads(message)
+    if not isinstance(message.get('alerts'), list) or not all(isinstance(alert, dict) and isinstance(alert.get('labels'), dict) for alert in message['alerts']):
+        raise ValueError("the message has no list of alerts with labels")
+    return message, topic_arn
+
+# Prefer the node-cache service when one is configured for the cluster, fall back
+# to listing the nodes from the API server when it is unreachable or not synced yet
+def scan_nodes(cluster, region):
+    if NODE_CACHE_URL and cluster == CLUSTER_ID:
+        try:
+            return get_node_scan(NODE_CACHE_URL)
+        except Exception as error:
+            logger.warning(f"Node cache at {NODE_CACHE_URL} unavailable, listing nodes from the API server: {error}")
+    kubeapi = get_kube_api(cluster, region)
+    return kubeapi.scan_nodes(NODE_LIST_PAGE_SIZE, NODE_LABEL_SELECTOR)
+
+# Instance ID -> epoch time of the last log collection started for it
+def collection_history(nodes):
+    try:
+        executions = open_execution_store().get([node.instance_id for node in nodes if node.instance_id])
+    except Exception as error:
+        logger.warning(f"Failed to read the log collection history, ranking nodes without it: {error}")
+        return dict()
+    return {instance: execution['startedAt'] for instance, execution in executions.items()}
+
+# Collects the nodes named by KubeNNR alerts, except the instances already started
+def nnr_execution(cluster, region, nodes, started=()):
+    try:
+        instances = [instance for instance in get_instances(nodes, get_cluster_vpc(cluster, region)) if instance not in started]
+        return dispatch(cluster, instances)
     except Exception as error:
         raise error
     
-def nnr_max_execution(nodes, nodes_max_limit):
+# Collects the ranked NotReady nodes, unless the cluster had a collection started
+# recently. Returns the instances the automation was started for.
+def nnr_max_execution(cluster, region, nodes, nodes_max_limit):
+    started = list()
     try:
-        not_ready_instances = get_instances(nodes)
+        vpc_id = get_cluster_vpc(cluster, region) if any(not node.instance_id for node in nodes) else None
+        not_ready_instances = resolve_instances(nodes, vpc_id)
         logger.info(f"Found {len(not_ready_instances)} instances in Not Ready state: {', '.join(not_ready_instances)}")
-        bundles = list_bundles_latest(LOG_COLLECTION_BUCKET, BUNDLE_RECENCY_SECONDS)
-        if len(bundles) > 0:
-            logger.info(f"Log bundles already uploaded in last {BUNDLE_RECENCY_SECONDS} secs, skipping.")
+        if marked_since(LOG_COLLECTION_BUCKET, cluster_marker_key(cluster), BUNDLE_RECENCY_SECONDS):
+            logger.info(f"Log collection already started for {cluster} in last {BUNDLE_RECENCY_SECONDS} secs, skipping.")
         else:
             if len(not_ready_instances) > nodes_max_limit:
                 logger.info(f"Limiting log collection to {nodes_max_limit} nodes")
                 not_ready_instances = not_ready_instances[:nodes_max_limit]
-            for instance in not_ready_instances:
-                exec_id = start_execution(instance, LOG_COLLECTION_BUCKET, SSM_AUTOMATION_EXECUTION_ROLE_ARN)
-                logger.info(f"EKS Log Collector automation executed for {instance}: {exec_id}")
+            started = dispatch(cluster, not_ready_instances)
+            if len(started) > 1:
+                record_incident(cluster, started)
     except Exception as error:
-        raise error
\ No newline at end of file
+        raise error
+    return started
+
+# Groups the nodes collected for the same alert so their bundles are correlated
+def record_incident(cluster, instances):
+    started_at = int(time.time())
+    incident_id = f"{cluster}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(started_at))}"
+    put_marker(LOG_COLLECTION_BUCKET, incident_key(incident_id), {
+        'incidentId': incident_id,
+        'clusterName': cluster,
+        'startedAt': started_at,
+        'instanceIds': instances
+    })
+    for instance in instances:
+        put_marker(LOG_COLLECTION_BUCKET, incident_pointer_key(instance), {'incidentId': incident_id})
+    logger.info(f"Recorded incident {incident_id} for {', '.join(instances)}")
+
+# Starts the automation concurrently for the instances that do not already have
+# one running or are not in their cooldown window, and records every execution started.
+# Returns the instances the automation was started for.
+def dispatch(cluster, instances):
+    store = open_execution_store()
+    cooldown = open_cooldown_store()
+    # A record still marked active may belong to an execution that has finished
+    # since, its status is refreshed so that it does not hold back a new collection
+    running = list()
+    for instance, execution in store.get(instances).items():
+        if execution['status'] not in ACTIVE_STATUSES:
+            continue
+        try:
+            status = refresh_execution(store, execution)
+        except Exception as error:
+            logger.warning(f"Failed to refresh EKS Log Collector automation {execution['executionId']} for {instance}: {error}")
+            status = execution['status']
+        if status in ACTIVE_STATUSES:
+            running.append(instance)
+    for instance in running:
+        logger.info(f"EKS Log Collector automation already running for {instance}, skipping.")
+    pending = list()
+    for instance in instances:
+        if instance in running:
+            continue
+        if not cooldown.acquire(f"{cluster}/{instance}", NODE_COOLDOWN_SECONDS):
+            logger.info(f"Log collection already started for {instance} in last {NODE_COOLDOWN_SECONDS} secs, suppressed.")
+            continue
+        pending.append(instance)
+    results = start_executions(
+        pending,
+        LOG_COLLECTION_BUCKET,
+        SSM_AUTOMATION_EXECUTION_ROLE_ARN,
+        rate=SSM_START_RATE,
+        burst=SSM_START_CONCURRENCY,
+        max_workers=SSM_START_CONCURRENCY
+    )
+    started = list()
+    for instance, (exec_id, error) in results.items():
+        if error:
+            logger.error(f"Failed to start EKS Log Collector automation for {instance}: {error}")
+            cooldown.release(f"{cluster}/{instance}")
+            continue
+        logger.info(f"EKS Log Collector automation executed for {instance}: {exec_id}")
+        started.append(instance)
+        try:
+            store.put(instance, exec_id)
+        except Exception as error:
+            logger.error(f"Failed to record EKS Log Collector automation {exec_id} for {instance}: {error}")
+    if started:
+        put_marker(LOG_COLLECTION_BUCKET, cluster_marker_key(cluster), {'instanceIds': started})
+    return started
+
+# Reports the outcome and log bundle of executions started by earlier invocations,
+# the REPORT_MAX_EXECUTIONS oldest first. Stops when the invocation has less than
+# REPORT_RESERVE_MILLIS left, the others are reported by later invocations.
+def report_executions(context=None):
+    store = open_execution_store()
+    executions = store.active(REPORT_MAX_EXECUTIONS)
+    for checked, execution in enumerate(executions):
+        if context and context.get_remaining_time_in_millis() < REPORT_RESERVE_MILLIS:
+            logger.info(f"Leaving {len(executions) - checked} automation executions to report to later invocations")
+            break
+        refresh_execution(store, execution)
+
+# Polls the status of a recorded execution, and once it has finished stores the
+# final status with its log bundle. Returns the current status.
+def refresh_execution(store, execution):
+    status = get_execution_status(execution['executionId'])
+    if status in ACTIVE_STATUSES:
+        return status
+    bundle = find_bundle(LOG_COLLECTION_BUCKET, execution['instanceId'], execution['startedAt']) if status == 'Success' else None
+    store.update(execution['instanceId'], status, bundle)
+    location = f"s3://{LOG_COLLECTION_BUCKET}/{bundle}" if bundle else "no log bundle"
+    logger.info(f"EKS Log Collector automation {execution['executionId']} for {execution['instanceId']} finished with status {status}: {location}")
+    return status
\ No newline at end of file
@@ -0,0 +1,106 @@
+import re, tarfile
+from datetime import datetime, timezone
+
+# Log files of the eks-log-collector bundle scanned for every source
+SOURCES = {
+    'kubelet': re.compile(r'/kubelet/[^/]*(\.log|\.txt)$'),
+    'containerd': re.compile(r'/containerd/[^/]*(\.log|\.txt)$'),
+    'dmesg': re.compile(r'/(kernel|system)/dmesg[^/]*$'),
+    'ipamd': re.compile(r'/(ipamd|var_log/aws-routed-eni)/[^/]*ipamd[^/]*$'),
+}
+
+# (id, description, sources, pattern) of the known failure signatures
+SIGNATURES = [
+    ('pleg_unhealthy', 'Pod lifecycle event generator is not healthy', ('kubelet',),
+     r'PLEG is not healthy'),
+    ('container_runtime_down', 'Container runtime is down or unreachable', ('kubelet',),
+     r'container runtime is down|ContainerRuntimeNotReady|containerd\.sock: connect: (?:connection refused|no such file)'),
+    ('network_not_ready', 'CNI plugin not initialized', ('kubelet', 'containerd'),
+     r'NetworkPluginNotReady|cni plugin not initialized|network plugin is not ready'),
+    ('oom_kill', 'Processes killed by the kernel OOM killer', ('dmesg',),
+     r'invoked oom-killer|Out of memory: Kill|oom-kill:'),
+    ('ip_exhaustion', 'No IP address available for pods', ('ipamd', 'kubelet'),
+     r'InsufficientFreeAddressesInSubnet|no available IP/Prefix addresses|failed to assign an IP address to container|AssignIPv4Address: no available IP'),
+    ('disk_pressure', 'Node under disk pressure or out of disk space', ('kubelet', 'containerd', 'dmesg'),
+     r'DiskPressure|attempting to reclaim ephemeral-storage|no space left on device'),
+    ('kernel_hung_task', 'Tasks blocked in the kernel', ('dmesg',),
+     r'blocked for more than \d+ seconds'),
+]
+
+# One alternation per source with a named group per signature, so every line
+# is matched once whatever the number of signatures
+PATTERNS = {
+    source: re.compile('|'.join(f'(?P<{signature}>{pattern})' for signature, _, sources, pattern in SIGNATURES if source in sources))
+    for source in SOURCES
+}
+DESCRIPTIONS = {signature: description for signature, description, _, _ in SIGNATURES}
+
+MAX_SAMPLES = 3
+MAX_EVENTS = 1000
+MAX_LINE_LENGTH = 500
+
+ISO_TIME = re.compile(r'(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})')
+SYSLOG_TIME = re.compile(r'^([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}:\d{2}:\d{2})')
+DMESG_TIME = re.compile(r'^\[\w{3} (\w{3}) +(\d{1,2}) (\d{2}:\d{2}:\d{2}) (\d{4})\]')
+
+# Scans a gzipped tarball read from a file object in a single forward pass, nothing
+# is written to disk. Returns the signatures found with their counts and samples,
+# and the matched events with their timestamps.
+def analyze(fileobj, reference_time):
+    signatures = dict()
+    events = list()
+    files = 0
+    with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            source = next((source for source, path in SOURCES.items() if path.search('/' + member.name)), None)
+            if source is None:
+                continue
+            files += 1
+            for raw_line in archive.extractfile(member):
+                match = PATTERNS[source].search(raw_line.decode('utf-8', errors='replace'))
+                if not match:
+                    continue
+                line = match.string.strip()[:MAX_LINE_LENGTH]
+                timestamp = parse_time(line, reference_time)
+                found = signatures.setdefault(match.lastgroup, {
+                    'description': DESCRIPTIONS[match.lastgroup],
+                    'count': 0,
+                    'firstSeen': None,
+                    'lastSeen': None,
+                    'samples': list()
+                })
+                found['count'] += 1
+                if len(found['samples']) < MAX_SAMPLES:
+                    found['samples'].append({'file': member.name, 'line': line})
+                if timestamp:
+                    found['firstSeen'] = min(found['firstSeen'] or timestamp, timestamp)
+                    found['lastSeen'] = max(found['lastSeen'] or timestamp, timestamp)
+                    if len(events) < MAX_EVENTS:
+                        events.append({'time': timestamp, 'signature': match.lastgroup, 'source': source})
+    events.sort(key=lambda event: event['time'])
+    return {'filesScanned': files, 'signatures': signatures, 'events': events}
+
+# Returns the ISO 8601 UTC time of a log line, journal and syslog lines carry no
+# year so it is taken from reference_time, the upload time of the bundle
+def parse_time(line, reference_time):
+    try:
+        match = SYSLOG_TIME.search(line)
+        if match:
+            timestamp = datetime.strptime(f"{reference_time.year} {' '.join(match.groups())}", '%Y %b %d %H:%M:%S')
+            if timestamp.replace(tzinfo=timezone.utc) > reference_time:
+                timestamp = timestamp.replace(year=reference_time.year - 1)
+            return _format(timestamp)
+        match = DMESG_TIME.search(line)
+        if match:
+            return _format(datetime.strptime(' '.join(match.groups()), '%b %d %H:%M:%S %Y'))
+    except ValueError:
+        return None
+    match = ISO_TIME.search(line)
+    if match:
+        return f"{match.group(1)}T{match.group(2)}Z"
+    return None
+
+def _format(timestamp):
+    return timestamp.strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -0,0 +1,99 @@
+import boto3, botocore, os, sqlite3, threading, time
+
+dynamodb = boto3.resource("dynamodb")
+
+# One log collection per node within a cooldown window. acquire() is a conditional
+# write that only one caller wins until the window expires, repeated alerts for the
+# same node are counted as suppressed on the winning record.
+class DynamoDBCooldownStore:
+    def __init__(self, table_name):
+        self.table = dynamodb.Table(table_name)
+
+    def acquire(self, key, cooldown_seconds):
+        now = int(time.time())
+        try:
+            self.table.put_item(
+                Item={
+                    'nodeKey': key,
+                    'acquiredAt': now,
+                    'expiresAt': now + cooldown_seconds,
+                    'suppressedCount': 0
+                },
+                ConditionExpression='attribute_not_exists(nodeKey) OR expiresAt <= :now',
+                ExpressionAttributeValues={':now': now}
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise error
+            self._suppressed(key, now)
+            return False
+        else:
+            return True
+
+    def _suppressed(self, key, now):
+        try:
+            self.table.update_item(
+                Key={'nodeKey': key},
+                UpdateExpression='ADD suppressedCount :one SET lastSuppressedAt = :now',
+                ConditionExpression='attribute_exists(nodeKey)',
+                ExpressionAttributeValues={':one': 1, ':now': now}
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise error
+
+    # Gives the window back, used when the collection could not be started
+    def release(self, key):
+        try:
+            self.table.delete_item(Key={'nodeKey': key})
+        except botocore.exceptions.ClientError as error:
+            raise error
+
+# Stand-in for the DynamoDB table, in memory by default or in a local SQLite file
+class SQLiteCooldownStore:
+    def __init__(self, path=':memory:'):
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS cooldown ('
+            'node_key TEXT PRIMARY KEY, acquired_at INTEGER, expires_at INTEGER, '
+            'suppressed_count INTEGER, last_suppressed_at INTEGER)'
+        )
+        self._lock = threading.Lock()
+
+    def acquire(self, key, cooldown_seconds):
+        now = int(time.time())
+        with self._lock:
+            cursor = self._connection.execute(
+                'INSERT INTO cooldown VALUES (?, ?, ?, 0, NULL) '
+                'ON CONFLICT(node_key) DO UPDATE SET acquired_at = excluded.acquired_at, '
+                'expires_at = excluded.expires_at, suppressed_count = 0, last_suppressed_at = NULL '
+                'WHERE cooldown.expires_at <= ?',
+                (key, now, now + cooldown_seconds, now)
+            )
+            if cursor.rowcount:
+                return True
+            self._connection.execute(
+                'UPDATE cooldown SET suppressed_count = suppressed_count + 1, last_suppressed_at = ? WHERE node_key = ?',
+                (now, key)
+            )
+            return False
+
+    def release(self, key):
+        with self._lock:
+            self._connection.execute('DELETE FROM cooldown WHERE node_key = ?', (key,))
+
+    def get(self, key):
+        row = self._connection.execute('SELECT * FROM cooldown WHERE node_key = ?', (key,)).fetchone()
+        return dict(zip(('nodeKey', 'acquiredAt', 'expiresAt', 'suppressedCount', 'lastSuppressedAt'), row)) if row else None
+
+_local_store = None
+
+# COOLDOWN_TABLE selects the DynamoDB table, otherwise a SQLite store at
+# COOLDOWN_DB_PATH or in memory, which only lasts as long as the warm environment
+def open_store():
+    global _local_store
+    if os.environ.get('COOLDOWN_TABLE'):
+        return DynamoDBCooldownStore(os.environ['COOLDOWN_TABLE'])
+    if _local_store is None:
+        _local_store = SQLiteCooldownStore(os.environ.get('COOLDOWN_DB_PATH', ':memory:'))
+    return _local_store
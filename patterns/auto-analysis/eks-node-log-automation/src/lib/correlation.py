@@ -0,0 +1,59 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Correlates the bundle summaries of the nodes of one incident, summaries maps
+# instance ID -> summary written by the bundle analyzer.
+#
+# Events are indexed by (signature, time bucket) so that finding the nodes that
+# hit the same signature at about the same time is a lookup per event rather than
+# a comparison of every pair of nodes. An event is matched against its own bucket
+# and the previous one, so events either side of a bucket boundary still line up.
+def correlate(summaries, bucket_seconds=60):
+    index = defaultdict(set)
+    first_seen = defaultdict(dict)
+    for instance_id, summary in summaries.items():
+        for event in summary['events']:
+            timestamp = _epoch(event['time'])
+            index[(event['signature'], int(timestamp // bucket_seconds))].add(instance_id)
+            seen = first_seen[event['signature']]
+            if instance_id not in seen or event['time'] < seen[instance_id]:
+                seen[instance_id] = event['time']
+
+    analyzed = len(summaries)
+    nodes_by_signature = defaultdict(set)
+    for instance_id, summary in summaries.items():
+        for signature in summary['signatures']:
+            nodes_by_signature[signature].add(instance_id)
+
+    # A signature seen on at least half of the nodes, and on more than one, points at
+    # a cause shared by the cluster rather than one local to a node
+    signatures = dict()
+    for signature, nodes in sorted(nodes_by_signature.items(), key=lambda item: -len(item[1])):
+        signatures[signature] = {
+            'nodes': sorted(nodes),
+            'scope': 'cluster-wide' if len(nodes) > 1 and len(nodes) * 2 >= analyzed else 'node-local',
+            'firstSeen': dict(sorted(first_seen[signature].items(), key=lambda item: item[1]))
+        }
+
+    timeline = list()
+    for (signature, bucket), nodes in sorted(index.items(), key=lambda item: (item[0][1], item[0][0])):
+        previous = index.get((signature, bucket - 1), set())
+        nearby = nodes | previous
+        if len(nearby) > 1:
+            timeline.append({
+                'windowStart': _format((bucket - 1 if previous else bucket) * bucket_seconds),
+                'signature': signature,
+                'nodes': sorted(nearby)
+            })
+
+    return {
+        'scope': 'cluster-wide' if any(found['scope'] == 'cluster-wide' for found in signatures.values()) else 'node-local',
+        'signatures': signatures,
+        'timeline': timeline
+    }
+
+def _epoch(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc).timestamp()
+
+def _format(epoch):
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
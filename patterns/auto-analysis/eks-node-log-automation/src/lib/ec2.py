@@ -1,22 +1,61 @@
-import boto3, botocore
+import boto3, botocore, time
 
 ec2 = boto3.client("ec2")
 
-def get_instances(node_list):
+# DescribeInstances accepts at most 200 values per filter
+FILTER_BATCH_SIZE = 200
+# Node names map to private IP addresses, which can be reused by a new instance
+INSTANCE_CACHE_TTL_SECONDS = 600
+
+# (VPC ID, node name) -> (instance ID, expiry), kept at module level so warm invocations reuse it
+_instance_ids = dict()
+
+# Node names are only unique within a VPC, pass the VPC of the cluster when the
+# function serves clusters whose VPCs may overlap
+def get_instances(node_list, vpc_id=None):
+    instance_ids = _lookup_instance_ids(node_list, vpc_id)
+    return _unique([instance_ids.get(node) for node in node_list])
+
+# Resolves NotReady nodes to instance IDs, using the ID carried by the node's
+# providerID and only calling DescribeInstances for the nodes without one
+def resolve_instances(nodes, vpc_id=None):
+    instance_ids = _lookup_instance_ids([node.name for node in nodes if not node.instance_id], vpc_id)
+    return _unique([node.instance_id or instance_ids.get(node.name) for node in nodes])
+
+# Returns node name -> instance ID, describing the instances of the nodes that
+# are not cached in batches and through every page of results
+def _lookup_instance_ids(node_list, vpc_id=None):
     try:
-        response = ec2.describe_instances(
-            Filters=[
+        now = time.time()
+        instance_ids = dict()
+        missing = list()
+        for node in node_list:
+            instance_id, expires_at = _instance_ids.get((vpc_id, node), (None, 0))
+            if expires_at > now:
+                instance_ids[node] = instance_id
+            elif node not in missing:
+                missing.append(node)
+        paginator = ec2.get_paginator('describe_instances')
+        for start in range(0, len(missing), FILTER_BATCH_SIZE):
+            batch = missing[start:start + FILTER_BATCH_SIZE]
+            filters = [
                 {
                     'Name': 'private-dns-name',
-                    'Values': node_list
+                    'Values': batch
                 }
             ]
-        )
-        instances = list()
-        for reservation in response['Reservations']:
-            for instance in reservation['Instances']:
-                instances.append(instance['InstanceId'])
+            if vpc_id:
+                filters.append({'Name': 'vpc-id', 'Values': [vpc_id]})
+            for page in paginator.paginate(Filters=filters):
+                for reservation in page['Reservations']:
+                    for instance in reservation['Instances']:
+                        if instance['PrivateDnsName'] in batch:
+                            instance_ids[instance['PrivateDnsName']] = instance['InstanceId']
+                            _instance_ids[(vpc_id, instance['PrivateDnsName'])] = (instance['InstanceId'], now + INSTANCE_CACHE_TTL_SECONDS)
     except botocore.exceptions.ClientError as error:
         raise error
     else:
-        return instances
\ No newline at end of file
+        return instance_ids
+
+def _unique(instance_ids):
+    return list(dict.fromkeys(instance_id for instance_id in instance_ids if instance_id))
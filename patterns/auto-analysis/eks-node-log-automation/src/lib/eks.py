@@ -0,0 +1,16 @@
+import boto3, botocore
+
+# (cluster name, region) -> VPC ID, kept at module level so warm invocations reuse it
+_cluster_vpcs = dict()
+
+# VPC of the cluster from DescribeCluster, without building a Kubernetes client
+def get_cluster_vpc(cluster_name, region):
+    key = (cluster_name, region)
+    if key not in _cluster_vpcs:
+        try:
+            eks = boto3.client("eks", region_name=region)
+            cluster = eks.describe_cluster(name=cluster_name)
+        except botocore.exceptions.ClientError as error:
+            raise error
+        _cluster_vpcs[key] = cluster["cluster"].get("resourcesVpcConfig", {}).get("vpcId")
+    return _cluster_vpcs[key]
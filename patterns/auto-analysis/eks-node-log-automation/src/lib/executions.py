@@ -0,0 +1,120 @@
+import boto3, botocore, os, time
+from boto3.dynamodb.conditions import Key
+from lib.ssm import ACTIVE_STATUSES
+
+dynamodb = boto3.resource("dynamodb")
+
+# Records are removed by the table's TTL once they are this old
+EXECUTION_RETENTION_SECONDS = 7 * 24 * 3600
+BATCH_GET_SIZE = 100
+# Sparse index of the executions that have not finished yet. Only active records
+# carry the IN_FLIGHT attribute, ordered by startedAt, so listing them does not
+# read the finished ones.
+ACTIVE_INDEX = 'ActiveExecutions'
+IN_FLIGHT = 'inFlight'
+
+# Latest automation execution started for every instance, so that a later
+# invocation can report its outcome instead of starting another one
+class DynamoDBExecutionStore:
+    def __init__(self, table_name):
+        self.table_name = table_name
+        self.table = dynamodb.Table(table_name)
+
+    def get(self, instance_ids):
+        try:
+            executions = dict()
+            instance_ids = list(dict.fromkeys(instance_ids))
+            for start in range(0, len(instance_ids), BATCH_GET_SIZE):
+                request = {self.table_name: {'Keys': [{'instanceId': instance_id} for instance_id in instance_ids[start:start + BATCH_GET_SIZE]]}}
+                while request:
+                    response = dynamodb.batch_get_item(RequestItems=request)
+                    for item in response['Responses'].get(self.table_name, []):
+                        executions[item['instanceId']] = _execution(item)
+                    request = response.get('UnprocessedKeys')
+        except botocore.exceptions.ClientError as error:
+            raise error
+        else:
+            return executions
+
+    # Active executions, oldest first, at most limit of them when one is given
+    def active(self, limit=None):
+        try:
+            executions = list()
+            kwargs = {'IndexName': ACTIVE_INDEX, 'KeyConditionExpression': Key(IN_FLIGHT).eq(IN_FLIGHT)}
+            while limit is None or len(executions) < limit:
+                if limit is not None:
+                    kwargs['Limit'] = limit - len(executions)
+                response = self.table.query(**kwargs)
+                executions.extend(_execution(item) for item in response['Items'])
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except botocore.exceptions.ClientError as error:
+            raise error
+        else:
+            return executions
+
+    def put(self, instance_id, execution_id):
+        now = int(time.time())
+        try:
+            self.table.put_item(Item={
+                'instanceId': instance_id,
+                'executionId': execution_id,
+                'status': 'Pending',
+                'startedAt': now,
+                'expiresAt': now + EXECUTION_RETENTION_SECONDS,
+                IN_FLIGHT: IN_FLIGHT
+            })
+        except botocore.exceptions.ClientError as error:
+            raise error
+
+    def update(self, instance_id, status, bundle=None):
+        try:
+            self.table.update_item(
+                Key={'instanceId': instance_id},
+                UpdateExpression='SET #status = :status, bundle = :bundle' + ('' if status in ACTIVE_STATUSES else f' REMOVE {IN_FLIGHT}'),
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':status': status, ':bundle': bundle}
+            )
+        except botocore.exceptions.ClientError as error:
+            raise error
+
+# Stand-in used when no table is configured, only lasts as long as the warm environment
+class MemoryExecutionStore:
+    def __init__(self):
+        self.executions = dict()
+
+    def get(self, instance_ids):
+        return {instance_id: dict(self.executions[instance_id]) for instance_id in instance_ids if instance_id in self.executions}
+
+    def active(self, limit=None):
+        executions = sorted((execution for execution in self.executions.values() if execution['status'] in ACTIVE_STATUSES), key=lambda execution: execution['startedAt'])
+        return [dict(execution) for execution in executions[:limit]]
+
+    def put(self, instance_id, execution_id):
+        self.executions[instance_id] = {
+            'instanceId': instance_id,
+            'executionId': execution_id,
+            'status': 'Pending',
+            'startedAt': int(time.time()),
+            'bundle': None
+        }
+
+    def update(self, instance_id, status, bundle=None):
+        self.executions[instance_id].update(status=status, bundle=bundle)
+
+_memory_store = MemoryExecutionStore()
+
+def open_store():
+    if os.environ.get('EXECUTION_TABLE'):
+        return DynamoDBExecutionStore(os.environ['EXECUTION_TABLE'])
+    return _memory_store
+
+def _execution(item):
+    return {
+        'instanceId': item['instanceId'],
+        'executionId': item['executionId'],
+        'status': item['status'],
+        'startedAt': int(item['startedAt']),
+        'bundle': item.get('bundle')
+    }
@@ -1,30 +1,64 @@
-from kubernetes import client, config
+from kubernetes import client
 import boto3, botocore
-import base64, re
+import base64, json, os, re, tempfile, threading, time
+from collections import namedtuple, OrderedDict
+from datetime import datetime
 from botocore.signers import RequestSigner
 
+NodeScan = namedtuple('NodeScan', ['total', 'not_ready'])
+NotReadyNode = namedtuple('NotReadyNode', ['name', 'not_ready_since', 'instance_id', 'node_group', 'zone'], defaults=[None, None, None])
+
+# Labels set by managed node groups, Karpenter and eksctl, in order of preference
+NODE_GROUP_LABELS = ('eks.amazonaws.com/nodegroup', 'karpenter.sh/nodepool', 'alpha.eksctl.io/nodegroup-name')
+ZONE_LABEL = 'topology.kubernetes.io/zone'
+
+STS_TOKEN_EXPIRES_IN = 60
+# Refresh the bearer token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 10
+
+# Number of clusters whose KubeAPI client is kept, the least recently used one is closed beyond it
+KUBE_API_CACHE_SIZE = int(os.environ.get('KUBE_API_CACHE_SIZE', '16'))
+
+# KubeAPI clients are kept at module level so warm invocations reuse the cluster
+# endpoint, CA and HTTP connection pool instead of rebuilding them per alert.
+# They share one session, whose credentials sign the tokens of every cluster.
+_kubeapis = OrderedDict()
+_kubeapis_lock = threading.Lock()
+_session = boto3.session.Session()
+
+def get_kube_api(cluster_name, region):
+    key = (cluster_name, region)
+    with _kubeapis_lock:
+        if key in _kubeapis:
+            _kubeapis.move_to_end(key)
+        else:
+            _kubeapis[key] = KubeAPI(cluster_name, region)
+            while len(_kubeapis) > KUBE_API_CACHE_SIZE:
+                _, evicted = _kubeapis.popitem(last=False)
+                evicted.close()
+        return _kubeapis[key]
+
 class KubeAPI:
     def __init__(self, cluster_name, region):
         self.cluster_name = cluster_name
         self.region = region
-        kubeconfig = self._get_kubeconfig(cluster_name, region)
-        config.load_kube_config_from_dict(config_dict=kubeconfig)
-        self.core_v1 = client.CoreV1Api()
+        self.session = _session
+        self.sts = self.session.client('sts', region_name=region)
+        self.ca_file = None
+        self._token_expires_at = 0
+        self.api_client = client.ApiClient(self._get_configuration(cluster_name, region))
+        self.core_v1 = client.CoreV1Api(self.api_client)
 
     def _get_bearer_token(self):
-        STS_TOKEN_EXPIRES_IN = 60
-        session = boto3.session.Session()
-
-        client = session.client('sts', region_name=self.region)
-        service_id = client.meta.service_model.service_id
+        service_id = self.sts.meta.service_model.service_id
 
         signer = RequestSigner(
             service_id,
             self.region,
             'sts',
             'v4',
-            session.get_credentials(),
-            session.events
+            self.session.get_credentials(),
+            self.session.events
         )
 
         params = {
@@ -49,71 +83,90 @@ class KubeAPI:
         # remove any base64 encoding padding:
         return 'k8s-aws-v1.' + re.sub(r'=*', '', base64_url)
 
-    def _get_kubeconfig(self, cluster_name, region):
+    # Called by the kubernetes client before every request, only signs a new
+    # token when the current one is about to expire
+    def _refresh_token(self, configuration):
+        if time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN:
+            return
+        configuration.api_key['authorization'] = self._get_bearer_token()
+        self._token_expires_at = time.time() + STS_TOKEN_EXPIRES_IN
+
+    def _get_configuration(self, cluster_name, region):
         try:
             eks = boto3.client("eks", region_name=region)
             cluster = eks.describe_cluster(name=cluster_name)
-            token = self._get_bearer_token()
-            cluster_config = {
-                "apiVersion": "v1",
-                "clusters": [{
-                    "name": cluster_name,
-                    "cluster": {
-                        "certificate-authority-data": cluster["cluster"]["certificateAuthority"]["data"],
-                        "server": cluster["cluster"]["endpoint"]
-                    }
-                }],
-                "contexts": [{"name": cluster["cluster"]["arn"], "context": {"cluster": cluster_name, "user": "aws"}}],
-                "current-context": cluster["cluster"]["arn"],
-                "kind": "Config",
-                "preferences": {},
-                "users": [{"name": "aws", "user" : {"token": token}}]
-            }
         except botocore.exceptions.ClientError as error:
             raise error
-        else:
-            return cluster_config
 
-    def get_nodes_count(self):
-        try:
-            continue_token = None
-            count = 0
-            while True:
-                if continue_token:
-                    node_list = self.core_v1.list_node(limit=100, _continue=continue_token)
-                else:
-                    node_list = self.core_v1.list_node(limit=100)
-                continue_token = node_list.metadata._continue
-                count += len(node_list.items)
-                if continue_token is None:
-                    break
-        except client.exceptions.ApiException as error:
-            raise error
-        else:
-            return count
-        
-    def list_nodes_notready(self, node_limit):
+        ca_file = tempfile.NamedTemporaryFile(prefix='eks-ca-', suffix='.crt', delete=False)
+        with ca_file:
+            ca_file.write(base64.b64decode(cluster["cluster"]["certificateAuthority"]["data"]))
+        self.ca_file = ca_file.name
+
+        configuration = client.Configuration()
+        configuration.host = cluster["cluster"]["endpoint"]
+        configuration.ssl_ca_cert = ca_file.name
+        configuration.api_key_prefix['authorization'] = 'Bearer'
+        configuration.refresh_api_key_hook = self._refresh_token
+        self._refresh_token(configuration)
+        return configuration
+
+    # Releases the connection pool and the CA file of a client evicted from the cache
+    def close(self):
+        self.api_client.close()
+        if self.ca_file and os.path.exists(self.ca_file):
+            os.remove(self.ca_file)
+
+    # Pages through the nodes once and returns the total node count together with
+    # the NotReady nodes, the time of their last Ready condition transition, the
+    # instance ID from their providerID and their node group and zone.
+    # The raw JSON is parsed directly instead of being deserialized into V1Node models.
+    def scan_nodes(self, page_size=500, label_selector=None, field_selector=None):
         try:
             continue_token = None
+            total = 0
             not_ready_nodes = list()
             while True:
+                kwargs = {'limit': page_size, '_preload_content': False}
                 if continue_token:
-                    node_list = self.core_v1.list_node(limit=100, _continue=continue_token)
-                else:
-                    node_list = self.core_v1.list_node(limit=100)
-                continue_token = node_list.metadata._continue
-                for node in node_list.items:
-                    for condition in node.status.conditions:
-                        if condition.type == 'Ready' and condition.status != 'True':
-                            not_ready_nodes.append(node.metadata.name)
-                if continue_token is None or len(not_ready_nodes) >= node_limit:
+                    kwargs['_continue'] = continue_token
+                if label_selector:
+                    kwargs['label_selector'] = label_selector
+                if field_selector:
+                    kwargs['field_selector'] = field_selector
+                response = self.core_v1.list_node(**kwargs)
+                node_list = json.loads(response.data)
+                continue_token = node_list['metadata'].get('continue')
+                total += len(node_list['items'])
+                for node in node_list['items']:
+                    for condition in node.get('status', {}).get('conditions', []):
+                        if condition['type'] == 'Ready' and condition['status'] != 'True':
+                            not_ready_nodes.append(NotReadyNode(
+                                node['metadata']['name'],
+                                _parse_time(condition.get('lastTransitionTime')),
+                                instance_id_from_provider_id(node.get('spec', {}).get('providerID')),
+                                node_group(node['metadata'].get('labels', {})),
+                                node['metadata'].get('labels', {}).get(ZONE_LABEL)
+                            ))
+                if not continue_token:
                     break
         except client.exceptions.ApiException as error:
             raise error
         else:
-            return not_ready_nodes
-
-    
+            return NodeScan(total, not_ready_nodes)
 
+# providerID of EC2 nodes has the form aws:///<availability-zone>/<instance-id>
+def instance_id_from_provider_id(provider_id):
+    if not provider_id or not provider_id.startswith('aws://'):
+        return None
+    instance_id = provider_id.rsplit('/', 1)[-1]
+    return instance_id if instance_id.startswith('i-') else None
 
+def node_group(labels):
+    for label in NODE_GROUP_LABELS:
+        if label in labels:
+            return labels[label]
+    return None
 
+def _parse_time(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00')) if value else None
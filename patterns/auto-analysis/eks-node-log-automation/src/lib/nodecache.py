@@ -0,0 +1,16 @@
+import json, urllib.request
+from lib.kubernetes import NodeScan, NotReadyNode, _parse_time
+
+# Reads the node readiness held by the node-cache service in the cluster, so an
+# alert does not have to list every node from the API server
+def get_node_scan(url, timeout=2):
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/nodes', timeout=timeout) as response:
+            snapshot = json.loads(response.read())
+    except Exception as error:
+        raise error
+    else:
+        return NodeScan(snapshot['total'], [
+            NotReadyNode(node['name'], _parse_time(node.get('notReadySince')), node.get('instanceId'), node.get('nodeGroup'), node.get('zone'))
+            for node in snapshot['notReady']
+        ])
@@ -0,0 +1,33 @@
+from datetime import datetime, timezone
+
+# Picks the NotReady nodes to collect logs from when there are more than the
+# collection budget. Nodes are chosen one at a time, preferring in order:
+#   - nodes without a log collection started in the last history_seconds
+#   - a node group, then a zone, not yet covered by the nodes already chosen
+#   - nodes that have been NotReady for the longest, closest to the first failure
+# collected_at maps instance ID -> epoch time of the last collection started for it.
+def rank_nodes(nodes, limit, collected_at=None, history_seconds=0, now=None):
+    collected_at = collected_at or dict()
+    now = now or datetime.now(timezone.utc).timestamp()
+    candidates = list(nodes)
+    selected = list()
+    node_groups = set()
+    zones = set()
+
+    def score(node):
+        recently_collected = now - collected_at.get(node.instance_id, 0) < history_seconds
+        not_ready_since = node.not_ready_since.timestamp() if node.not_ready_since else now
+        return (
+            not recently_collected,
+            node.node_group not in node_groups,
+            node.zone not in zones,
+            -not_ready_since
+        )
+
+    while candidates and len(selected) < limit:
+        node = max(candidates, key=score)
+        candidates.remove(node)
+        selected.append(node)
+        node_groups.add(node.node_group)
+        zones.add(node.zone)
+    return selected
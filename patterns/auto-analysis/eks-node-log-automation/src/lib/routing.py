@@ -0,0 +1,31 @@
+import boto3, botocore
+
+sns = boto3.client("sns")
+
+# Tags the template puts on the alert topic, naming the cluster it serves
+CLUSTER_NAME_TAG = 'ClusterName'
+CLUSTER_REGION_TAG = 'ClusterRegion'
+
+# Topic ARN -> (cluster name, region), kept at module level so warm invocations reuse it
+_topic_clusters = dict()
+
+# Returns the cluster and region of the alerts published to the topic from the
+# topic tags, (None, None) when the topic is not tagged or cannot be read
+def get_topic_cluster(topic_arn):
+    if not topic_arn:
+        return None, None
+    if topic_arn not in _topic_clusters:
+        try:
+            tags = sns.list_tags_for_resource(ResourceArn=topic_arn)['Tags']
+        except botocore.exceptions.ClientError:
+            return None, None
+        tags = {tag['Key']: tag['Value'] for tag in tags}
+        _topic_clusters[topic_arn] = (tags.get(CLUSTER_NAME_TAG) or None, tags.get(CLUSTER_REGION_TAG) or None)
+    return _topic_clusters[topic_arn]
+
+# Picks the cluster of an alert from its labels, then from the topic it was
+# published to, then from the default cluster of the function
+def alert_cluster(labels, cluster_label, region_label, topic_cluster, default_cluster):
+    cluster = labels.get(cluster_label) or topic_cluster[0] or default_cluster[0]
+    region = labels.get(region_label) or topic_cluster[1] or default_cluster[1]
+    return cluster, region
@@ -1,17 +1,56 @@
-import boto3, botocore
+import boto3, botocore, json
 from datetime import datetime, timedelta
 import pytz
 
 s3 = boto3.resource("s3")
 
-def list_bundles_latest(bucket, time_delta):
+# Marker written for the cluster when log collection is dispatched, so that recent
+# collections are found with a single HeadObject instead of listing the bucket.
+# The eks_ prefix puts it under the bucket's lifecycle rule.
+MARKER_PREFIX = "eks_markers"
+
+def cluster_marker_key(cluster_name):
+    return f"{MARKER_PREFIX}/{cluster_name}/cluster"
+
+# Instances collected together for one KubeNNRMax alert, with a pointer from every
+# instance to its incident so the bundle analyzer can find the other nodes
+INCIDENT_PREFIX = "eks_incidents"
+
+def incident_key(incident_id):
+    return f"{INCIDENT_PREFIX}/{incident_id}/incident.json"
+
+def incident_report_key(incident_id):
+    return f"{INCIDENT_PREFIX}/{incident_id}/correlation.json"
+
+def incident_pointer_key(instance_id):
+    return f"{INCIDENT_PREFIX}/instances/{instance_id}.json"
+
+def put_marker(bucket, key, body):
+    try:
+        s3.meta.client.put_object(Bucket=bucket, Key=key, Body=json.dumps(body).encode('utf-8'), ContentType='application/json')
+    except botocore.exceptions.ClientError as error:
+        raise error
+
+# Whether the marker was written in the last time_delta seconds
+def marked_since(bucket, key, time_delta):
     start_from = datetime.now(pytz.utc) - timedelta(seconds=time_delta)
     try:
-        bucket = s3.Bucket(bucket)
-        bundles = bucket.objects.filter()
-        bundles = [obj.key for obj in sorted(bundles, key=lambda x: x.last_modified, reverse=True) if obj.last_modified >= start_from]
+        response = s3.meta.client.head_object(Bucket=bucket, Key=key)
     except botocore.exceptions.ClientError as error:
+        if error.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
         raise error
     else:
-        return bundles
+        return response['LastModified'] >= start_from
 
+# The automation uploads the bundle of an instance as eks_<instance-id>_<timestamp>.tar.gz,
+# returns the key of the latest one uploaded since the given epoch time
+def find_bundle(bucket, instance_id, since):
+    start_from = datetime.fromtimestamp(since, pytz.utc)
+    try:
+        bundles = s3.Bucket(bucket).objects.filter(Prefix=f"eks_{instance_id}_")
+        bundles = [obj for obj in bundles if obj.last_modified >= start_from]
+    except botocore.exceptions.ClientError as error:
+        raise error
+    else:
+        return max(bundles, key=lambda x: x.last_modified).key if bundles else None
@@ -1,18 +1,81 @@
 import boto3, botocore
+import random, threading, time
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 
-ssm = boto3.client("ssm")
+# Throttles of the starts are retried below with jitter, keep the SDK from retrying them on its own as well
+ssm = boto3.client("ssm", config=Config(retries={'mode': 'standard', 'max_attempts': 1}))
+# Status polls have no retry of their own and keep the SDK's standard retries
+ssm_status = boto3.client("ssm", config=Config(retries={'mode': 'standard'}))
 
-def start_execution(instance_id, bucket, role_arn):
+DOCUMENT_NAME = 'AWSSupport-CollectEKSInstanceLogs'
+THROTTLING_ERROR_CODES = ('ThrottlingException', 'TooManyUpdates')
+MAX_ATTEMPTS = 5
+BASE_DELAY_SECONDS = 0.2
+MAX_DELAY_SECONDS = 2.0
+ACTIVE_STATUSES = ('Pending', 'InProgress', 'Waiting', 'Scheduled', 'RunbookInProgress', 'PendingApproval', 'Approved', 'Cancelling')
+
+# Hands out at most rate tokens per second, allowing bursts of up to burst tokens
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+def start_execution(instance_id, bucket, role_arn, limiter=None):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if limiter:
+            limiter.acquire()
+        try:
+            response = ssm.start_automation_execution(
+                DocumentName=DOCUMENT_NAME,
+                Parameters={
+                    'EKSInstanceId': [instance_id],
+                    'LogDestination': [bucket],
+                    'AutomationAssumeRole': [role_arn]
+                }
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] not in THROTTLING_ERROR_CODES or attempt == MAX_ATTEMPTS:
+                raise error
+            time.sleep(random.uniform(0, min(MAX_DELAY_SECONDS, BASE_DELAY_SECONDS * 2 ** attempt)))
+        else:
+            return response.get('AutomationExecutionId')
+
+# Starts the automation for every instance concurrently under a shared token bucket.
+# Returns instance ID -> (execution ID, error) so that one failed start does not drop the others.
+def start_executions(instance_ids, bucket, role_arn, rate=5, burst=5, max_workers=5):
+    if not instance_ids:
+        return dict()
+    limiter = TokenBucket(rate, burst)
+
+    def start(instance_id):
+        try:
+            return start_execution(instance_id, bucket, role_arn, limiter), None
+        except Exception as error:
+            return None, error
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(instance_ids))) as executor:
+        return dict(zip(instance_ids, executor.map(start, instance_ids)))
+
+def get_execution_status(execution_id):
     try:
-        response = ssm.start_automation_execution(
-            DocumentName='AWSSupport-CollectEKSInstanceLogs',
-            Parameters={
-                'EKSInstanceId': [instance_id],
-                'LogDestination': [bucket],
-                'AutomationAssumeRole': [role_arn]
-            }
-        )
+        response = ssm_status.get_automation_execution(AutomationExecutionId=execution_id)
     except botocore.exceptions.ClientError as error:
         raise error
     else:
-        return response.get('AutomationExecutionId')
+        return response['AutomationExecution']['AutomationExecutionStatus']
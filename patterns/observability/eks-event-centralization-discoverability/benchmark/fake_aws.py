@@ -0,0 +1,319 @@
+import json
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import botocore
+
+
+# Calls made through ScanEngine.call on the current thread. Only these are
+# throttled: the engine retries them, while the calls the handler makes directly
+# rely on the SDK retries, which the fake clients do not emulate.
+_engine_scope = threading.local()
+
+
+def engine_call(call):
+    def wrapper(*args, **kwargs):
+        _engine_scope.depth = getattr(_engine_scope, 'depth', 0) + 1
+        try:
+            return call(*args, **kwargs)
+        finally:
+            _engine_scope.depth -= 1
+    return wrapper
+
+
+# In-memory stand-in for the AWS APIs used by the discovery Lambda, modelling an
+# organization of accounts x regions with a number of EKS clusters spread across
+# them, a fixed latency per call and a rate of throttling errors on the calls
+# made through the scan engine. The AWS Config aggregator and Resource Explorer
+# view cover the given fraction of the accounts.
+class FakeOrganization:
+    def __init__(self, accounts=100, regions=17, clusters=500, latency=0.02, throttle_rate=0.0, seed=0, coverage=1.0):
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.tooling_account_id = '100000000000'
+        self.account_ids = [self.tooling_account_id] + [str(100000000001 + index) for index in range(accounts - 1)]
+        self.regions = [f'region-{index:02d}' for index in range(regions)]
+        self.clusters = {}
+        for index in range(clusters):
+            key = (self.random.choice(self.account_ids), self.random.choice(self.regions))
+            self.clusters.setdefault(key, []).append(f'cluster-{index:05d}')
+        self.covered_account_ids = set(self.random.sample(self.account_ids, round(len(self.account_ids) * coverage)))
+        self.objects = {}
+        self.invocations = []
+        self.calls = Counter()
+        self.throttles = Counter()
+        self._lock = threading.Lock()
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.throttles.clear()
+
+    def call(self, service, operation):
+        with self._lock:
+            self.calls[f'{service}:{operation}'] += 1
+            throttled = getattr(_engine_scope, 'depth', 0) > 0 and self.random.random() < self.throttle_rate
+            if throttled:
+                self.throttles[f'{service}:{operation}'] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return throttled
+
+    def client(self, service, account_id=None, region=None):
+        return FakeClient(self, service, account_id or self.tooling_account_id, region or 'us-east-1')
+
+
+# Returns the page of items starting at the NextToken and the token of the next page
+def _page(items, size, token=None):
+    start = int(token or 0)
+    next_token = str(start + size) if start + size < len(items) else None
+    return items[start:start + size], next_token
+
+
+class FakePaginator:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def paginate(self, **kwargs):
+        return iter(self.pages())
+
+
+# Minimal stand-in for the botocore event system, emitting before-call and
+# after-call so that client instrumentation sees the simulated calls
+class FakeEvents:
+    def __init__(self):
+        self.handlers = defaultdict(list)
+
+    def register(self, event_name, handler):
+        self.handlers[event_name].append(handler)
+
+    def emit(self, event_name, **kwargs):
+        for handler in self.handlers[event_name]:
+            handler(**kwargs)
+
+
+class FakeClient:
+    def __init__(self, organization, service, account_id, region):
+        self.organization = organization
+        self.service = service
+        self.account_id = account_id
+        self.region = region
+        self.meta = SimpleNamespace(region_name=region, events=FakeEvents())
+
+    def _call(self, operation):
+        model = SimpleNamespace(name=operation, service_model=SimpleNamespace(service_id=self.service))
+        context = {}
+        self.meta.events.emit('before-call', model=model, params={}, context=context)
+        throttled = self.organization.call(self.service, operation)
+        parsed = {'ResponseMetadata': {'RetryAttempts': 0}}
+        if throttled:
+            parsed['Error'] = {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}
+        self.meta.events.emit('after-call', http_response=None, parsed=parsed, model=model, context=context)
+        if throttled:
+            raise botocore.exceptions.ClientError(parsed, operation)
+
+    # sts
+    def get_caller_identity(self):
+        self._call('GetCallerIdentity')
+        return {'Account': self.organization.tooling_account_id}
+
+    def assume_role(self, RoleArn, RoleSessionName, **kwargs):
+        self._call('AssumeRole')
+        account_id = RoleArn.split(':')[4]
+        if account_id not in self.organization.account_ids:
+            raise botocore.exceptions.ClientError({'Error': {'Code': 'AccessDenied', 'Message': 'Not authorized'}}, 'AssumeRole')
+        return {'Credentials': {
+            'AccessKeyId': account_id,
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': datetime.now(timezone.utc) + timedelta(hours=1),
+        }}
+
+    # organizations
+    def get_paginator(self, operation):
+        def pages():
+            self._call('ListAccounts')
+            return [{'Accounts': [{'Id': account_id, 'Name': f'account-{account_id}', 'Status': 'ACTIVE'}
+                                  for account_id in self.organization.account_ids]}]
+        return FakePaginator(pages)
+
+    # ec2
+    def describe_regions(self, **kwargs):
+        self._call('DescribeRegions')
+        return {'Regions': [{'RegionName': region} for region in self.organization.regions]}
+
+    # eks
+    def list_clusters(self, **kwargs):
+        self._call('ListClusters')
+        return {'clusters': list(self.organization.clusters.get((self.account_id, self.region), []))}
+
+    def describe_cluster(self, name):
+        self._call('DescribeCluster')
+        return {'cluster': {
+            'name': name,
+            'arn': f'arn:aws:eks:{self.region}:{self.account_id}:cluster/{name}',
+            'version': '1.30',
+            'platformVersion': 'eks.8',
+            'status': 'ACTIVE',
+            'createdAt': datetime(2024, 1, 1, tzinfo=timezone.utc),
+            'resourcesVpcConfig': {'endpointPublicAccess': True, 'endpointPrivateAccess': True},
+            'logging': {'clusterLogging': [{'types': ['api', 'audit'], 'enabled': True}]},
+            'tags': {'cluster': name},
+        }}
+
+    # Every cluster has two managed node groups, one Fargate profile and three add-ons
+    def list_nodegroups(self, clusterName, **kwargs):
+        self._call('ListNodegroups')
+        return {'nodegroups': [f'{clusterName}-ng-{index}' for index in range(2)]}
+
+    def describe_nodegroup(self, clusterName, nodegroupName):
+        self._call('DescribeNodegroup')
+        return {'nodegroup': {
+            'nodegroupName': nodegroupName,
+            'status': 'ACTIVE',
+            'version': '1.30',
+            'releaseVersion': '1.30.0-20240703',
+            'amiType': 'AL2023_x86_64_STANDARD',
+            'capacityType': 'ON_DEMAND',
+            'instanceTypes': ['m5.large'],
+            'scalingConfig': {'minSize': 1, 'maxSize': 3, 'desiredSize': 2},
+        }}
+
+    def list_fargate_profiles(self, clusterName, **kwargs):
+        self._call('ListFargateProfiles')
+        return {'fargateProfileNames': [f'{clusterName}-fp']}
+
+    def describe_fargate_profile(self, clusterName, fargateProfileName):
+        self._call('DescribeFargateProfile')
+        return {'fargateProfile': {'fargateProfileName': fargateProfileName, 'status': 'ACTIVE', 'selectors': [{'namespace': 'kube-system'}]}}
+
+    def list_addons(self, clusterName, **kwargs):
+        self._call('ListAddons')
+        return {'addons': ['coredns', 'kube-proxy', 'vpc-cni']}
+
+    def describe_addon(self, clusterName, addonName):
+        self._call('DescribeAddon')
+        return {'addon': {'addonName': addonName, 'addonVersion': 'v1.0.0-eksbuild.1', 'status': 'ACTIVE'}}
+
+    def describe_addon_versions(self, **kwargs):
+        self._call('DescribeAddonVersions')
+        return {'addons': [{'addonName': name, 'addonVersions': [
+            {'addonVersion': 'v1.1.0-eksbuild.1', 'compatibilities': [{'clusterVersion': '1.30', 'defaultVersion': False}]},
+            {'addonVersion': 'v1.0.0-eksbuild.1', 'compatibilities': [{'clusterVersion': '1.30', 'defaultVersion': True}]},
+        ]} for name in ('coredns', 'kube-proxy', 'vpc-cni')]}
+
+    # resourcegroupstaggingapi
+    def get_resources(self, **kwargs):
+        self._call('GetResources')
+        return {'ResourceTagMappingList': [
+            {'ResourceARN': f'arn:aws:eks:{self.region}:{self.account_id}:cluster/{name}', 'Tags': [{'Key': 'cluster', 'Value': name}]}
+            for name in self.organization.clusters.get((self.account_id, self.region), [])
+        ]}
+
+    # config
+    def describe_configuration_aggregator_sources_status(self, ConfigurationAggregatorName, NextToken=None, **kwargs):
+        self._call('DescribeConfigurationAggregatorSourcesStatus')
+        sources = [{'SourceId': account_id, 'SourceType': 'ACCOUNT', 'AwsRegion': region,
+                    'LastUpdateStatus': 'SUCCEEDED', 'LastUpdateTime': datetime.now(timezone.utc)}
+                   for account_id in sorted(self.organization.covered_account_ids) for region in self.organization.regions]
+        page, next_token = _page(sources, 100, NextToken)
+        return {'AggregatedSourceStatusList': page, 'NextToken': next_token}
+
+    def select_aggregate_resource_config(self, ConfigurationAggregatorName, Expression, Limit=100, NextToken=None):
+        self._call('SelectAggregateResourceConfig')
+        results = [json.dumps({'accountId': account_id, 'awsRegion': region, 'resourceName': name, 'tags': [{'key': 'cluster', 'value': name}]})
+                   for (account_id, region), names in sorted(self.organization.clusters.items())
+                   if account_id in self.organization.covered_account_ids for name in names]
+        page, next_token = _page(results, Limit, NextToken)
+        return {'Results': page, 'NextToken': next_token}
+
+    # resource-explorer-2
+    def list_indexes_for_members(self, AccountIdList, NextToken=None, **kwargs):
+        self._call('ListIndexesForMembers')
+        indexes = [{'AccountId': account_id, 'Region': region, 'Type': 'LOCAL'}
+                   for account_id in AccountIdList if account_id in self.organization.covered_account_ids
+                   for region in self.organization.regions]
+        page, next_token = _page(indexes, 100, NextToken)
+        return {'Indexes': page, 'NextToken': next_token}
+
+    # Supports the resourcetype and region filters, results are capped at 1000
+    def search(self, QueryString, ViewArn, NextToken=None, **kwargs):
+        self._call('Search')
+        filters = dict(term.split(':', 1) for term in QueryString.split())
+        resources = [{'Arn': f'arn:aws:eks:{region}:{account_id}:cluster/{name}', 'OwningAccountId': account_id, 'Region': region,
+                      'ResourceType': 'eks:cluster', 'Properties': [{'Name': 'tags', 'Data': [{'Key': 'cluster', 'Value': name}]}]}
+                     for (account_id, region), names in sorted(self.organization.clusters.items())
+                     if account_id in self.organization.covered_account_ids and filters.get('region', region) == region
+                     for name in names]
+        page, next_token = _page(resources[:1000], 100, NextToken)
+        return {'Resources': page, 'NextToken': next_token,
+                'Count': {'TotalResources': len(resources), 'Complete': len(resources) <= 1000}}
+
+    # s3
+    def get_object(self, Bucket, Key):
+        self._call('GetObject')
+        if (Bucket, Key) not in self.organization.objects:
+            raise botocore.exceptions.ClientError({'Error': {'Code': 'NoSuchKey', 'Message': 'Not found'}}, 'GetObject')
+        return {'Body': FakeBody(self.organization.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self._call('PutObject')
+        self.organization.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+
+    def delete_object(self, Bucket, Key):
+        self._call('DeleteObject')
+        self.organization.objects.pop((Bucket, Key), None)
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call('CreateMultipartUpload')
+        self.organization.objects[(Bucket, Key)] = b''
+        return {'UploadId': 'upload'}
+
+    def upload_part(self, Bucket, Key, Body, PartNumber, **kwargs):
+        self._call('UploadPart')
+        self.organization.objects[(Bucket, Key)] += Body
+        return {'ETag': str(PartNumber)}
+
+    def complete_multipart_upload(self, **kwargs):
+        self._call('CompleteMultipartUpload')
+
+    def abort_multipart_upload(self, Bucket, Key, **kwargs):
+        self._call('AbortMultipartUpload')
+        self.organization.objects.pop((Bucket, Key), None)
+
+    # sns
+    def publish(self, **kwargs):
+        self._call('Publish')
+
+    # lambda, follow-up invocations are recorded for the caller to run
+    def invoke(self, FunctionName, Payload, **kwargs):
+        self._call('Invoke')
+        self.organization.invocations.append(Payload)
+        return {'StatusCode': 202}
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+# Replacement for boto3.Session, sessions built on assumed role credentials
+# resolve to the account whose ID was handed out as the access key
+class FakeSession:
+    organization = None
+
+    def __init__(self, botocore_session=None, **kwargs):
+        self.account_id = None
+        if botocore_session is not None:
+            self.account_id = botocore_session.get_credentials().access_key
+
+    def client(self, service, region_name=None, **kwargs):
+        return self.organization.client(service, self.account_id, region_name)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# Runs the discovery Lambda handler against a simulated organization and reports
+# wall time, API calls, throttles and peak memory per run.
+#
+#   python3 run_benchmark.py --accounts 300 --regions 17 --clusters 1000 --latency 0.05
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fake_aws import FakeOrganization, FakeSession, engine_call
+from lib.scan import ScanEngine
+
+BUCKET = 'eks-discovery-benchmark'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the EKS discovery Lambda against a simulated organization")
+    parser.add_argument('--accounts', type=int, default=100, help="number of accounts in the organization")
+    parser.add_argument('--regions', type=int, default=17, help="number of regions enabled in every account")
+    parser.add_argument('--clusters', type=int, default=500, help="number of EKS clusters spread across accounts and regions")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every API call")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of the API calls made through the scan engine failing with a throttling error")
+    parser.add_argument('--runs', type=int, default=2, help="consecutive invocations in the same warm environment")
+    parser.add_argument('--max-workers', type=int, default=32)
+    parser.add_argument('--per-account-workers', type=int, default=4)
+    parser.add_argument('--output-format', default='csv', choices=['csv', 'parquet', 'ndjson'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--deep-inventory', action='store_true', help="collect node groups, Fargate profiles and add-ons")
+    parser.add_argument('--backend', default='scan', choices=['scan', 'config', 'resource-explorer'], help="discovery backend locating the clusters")
+    parser.add_argument('--coverage', type=float, default=1.0, help="fraction of accounts covered by the aggregated inventory")
+    parser.add_argument('--no-memory', action='store_true', help="skip peak memory tracking, which slows the run down")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of an earlier benchmark to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative regression against the baseline")
+    return parser.parse_args()
+
+
+def load_handler(args):
+    os.environ.update({
+        'AWS_REGION': 'us-east-1',
+        'SNS_TOPIC_ARN': 'arn:aws:sns:us-east-1:100000000000:EKSDiscoverySNSTopic',
+        'S3_BUCKET_NAME': BUCKET,
+        'CROSS_ACCOUNT_ROLE_NAME': 'eks-discovery-cross-account-role',
+        'MAX_WORKERS': str(args.max_workers),
+        'PER_ACCOUNT_WORKERS': str(args.per_account_workers),
+        'OUTPUT_FORMAT': args.output_format,
+        'DISCOVERY_BACKEND': args.backend,
+        'DEEP_INVENTORY': str(args.deep_inventory).lower(),
+        'CONFIG_AGGREGATOR_NAME': 'eks-discovery-benchmark',
+        'RESOURCE_EXPLORER_VIEW_ARN': 'arn:aws:resource-explorer-2:us-east-1:100000000000:view/eks-discovery-benchmark/1',
+    })
+    os.environ.pop('INVENTORY_PATH', None)
+    return importlib.import_module('lambda_function')
+
+
+def run(args):
+    organization = FakeOrganization(
+        accounts=args.accounts,
+        regions=args.regions,
+        clusters=args.clusters,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        seed=args.seed,
+        coverage=args.coverage,
+    )
+    session = type('Session', (FakeSession,), {'organization': organization})
+    lambda_function = load_handler(args)
+
+    results = []
+    with mock.patch('boto3.client', lambda service, **kwargs: organization.client(service, region=kwargs.get('region_name'))), \
+         mock.patch('boto3.Session', session), \
+         mock.patch.object(ScanEngine, 'call', engine_call(ScanEngine.call)):
+        for index in range(args.runs):
+            organization.reset_counters()
+            if not args.no_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            # The handler prints its EMF metrics to stdout, keep them out of the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = lambda_function.lambda_handler({}, None)
+            wall_time = time.perf_counter() - start
+            peak_memory = None
+            if not args.no_memory:
+                peak_memory = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            results.append({
+                'run': index + 1,
+                'statusCode': response['statusCode'],
+                'wallTimeSeconds': round(wall_time, 3),
+                'apiCalls': sum(organization.calls.values()),
+                'throttles': sum(organization.throttles.values()),
+                'peakMemoryBytes': peak_memory,
+                'callsByOperation': dict(sorted(organization.calls.items())),
+            })
+    return results
+
+
+def print_results(results):
+    for result in results:
+        memory = f"{result['peakMemoryBytes'] / 1024 / 1024:.1f} MiB" if result['peakMemoryBytes'] is not None else "n/a"
+        print(f"Run {result['run']}: {result['wallTimeSeconds']:.2f}s, {result['apiCalls']} API call(s), "
+              f"{result['throttles']} throttle(s), peak memory {memory}")
+        for operation, count in result['callsByOperation'].items():
+            print(f"    {operation:40} {count}")
+
+
+# Compares wall time and API calls of every run with the baseline, returns the regressions found
+def compare(results, baseline, tolerance):
+    regressions = []
+    for result, previous in zip(results, baseline):
+        for metric in ('wallTimeSeconds', 'apiCalls'):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"Run {result['run']}: {metric} {result[metric]} exceeds baseline {previous[metric]}")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    results = run(args)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -19,7 +19,9 @@ class EKSDiscovery(Stack):
                  scope: Construct, 
                  construct_id: str, 
                  lambda_execution_role_name: str,
+                 function_name: str,
                  cross_account_role_name: str,
+                 health_events_table_name: str,
                  **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
         
@@ -40,7 +42,22 @@ class EKSDiscovery(Stack):
                                      "eks:ListClusters",
                                      "eks:DescribeCluster",
                                      "eks:ListTagsForResource",
+                                     "eks:ListNodegroups",
+                                     "eks:DescribeNodegroup",
+                                     "eks:ListFargateProfiles",
+                                     "eks:DescribeFargateProfile",
+                                     "eks:ListAddons",
+                                     "eks:DescribeAddon",
+                                     "eks:DescribeAddonVersions",
+                                     "tag:GetResources",
+                                     "config:DescribeConfigurationAggregatorSourcesStatus",
+                                     "config:SelectAggregateResourceConfig",
+                                     "resource-explorer-2:ListIndexesForMembers",
+                                     "resource-explorer-2:Search",
+                                     "s3:GetObject",
                                      "s3:PutObject",
+                                     "s3:AbortMultipartUpload",
+                                     "s3:DeleteObject",
                                      "sns:Publish"],
                             resources=["*"]
                         )
@@ -52,11 +69,13 @@ class EKSDiscovery(Stack):
         lambda_function = lambda_.Function(
             self, 
             "eks-discovery-lambda",
+            function_name=function_name,
             runtime=lambda_.Runtime.PYTHON_3_12,
             handler="lambda_function.lambda_handler",
             code=lambda_.Code.from_asset("../src"),
             role=lambda_execution_role,
             timeout=Duration.seconds(600),
+            memory_size=512,
         )
         
         bucket = s3.Bucket(self, 
@@ -68,6 +87,8 @@ class EKSDiscovery(Stack):
                            bucket_name=f"eks-discovery-{self.account}-{self.region}",
                            removal_policy=RemovalPolicy.DESTROY, 
                            auto_delete_objects=True)  
+        # ListBucket lets S3 answer NoSuchKey rather than AccessDenied for the inventory of the first run
+        bucket.grant_read_write(lambda_execution_role)
         
         topic = sns.Topic(self,
                           id="EKSDiscoverySNSTopic",
@@ -102,6 +123,70 @@ class EKSDiscovery(Stack):
         lambda_function.add_environment("S3_BUCKET_NAME", bucket.bucket_name)
         lambda_function.add_environment("SNS_TOPIC_ARN", topic.topic_arn)
         lambda_function.add_environment("CROSS_ACCOUNT_ROLE_NAME", cross_account_role_name)
+        lambda_function.add_environment("MAX_WORKERS", "32")
+        lambda_function.add_environment("PER_ACCOUNT_WORKERS", "4")
+        lambda_function.add_environment("OUTPUT_FORMAT", "csv")
+        lambda_function.add_environment("INVENTORY_MAX_AGE_HOURS", "24")
+        lambda_function.add_environment("REGION_RECHECK_HOURS", "168")
+        lambda_function.add_environment("CHECKPOINT_RESERVE_SECONDS", "120")
+        lambda_function.add_environment("CONTINUATION", "invoke")
+        # Set to config or resource-explorer, with CONFIG_AGGREGATOR_NAME or
+        # RESOURCE_EXPLORER_VIEW_ARN, to locate clusters from an aggregated inventory
+        lambda_function.add_environment("DISCOVERY_BACKEND", "scan")
+        lambda_function.add_environment("DEEP_INVENTORY", "false")
+
+        # Runs that do not finish within the timeout continue in a new invocation.
+        # The ARN is built from the function name, so that the role does not depend
+        # on the function, which already depends on the role.
+        iam.Policy(
+            self,
+            "SelfInvokePolicy",
+            roles=[lambda_execution_role],
+            statements=[
+                iam.PolicyStatement(
+                    actions=["lambda:InvokeFunction"],
+                    resources=[f"arn:{self.partition}:lambda:{self.region}:{self.account}:function:{function_name}"]
+                )
+            ]
+        )
+
+        # Joins the latest inventory with the stored Health events into a SQLite
+        # index in the bucket, queried with query/fleet_query.py
+        index_function = lambda_.Function(
+            self,
+            "FleetIndex",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="fleet_index.lambda_handler",
+            code=lambda_.Code.from_asset("../src"),
+            timeout=Duration.seconds(300),
+            memory_size=512,
+            environment={
+                "S3_BUCKET_NAME": bucket.bucket_name,
+                "HEALTH_EVENTS_TABLE": health_events_table_name,
+                "INDEX_KEY": "index/fleet.db"
+            }
+        )
+        bucket.grant_read_write(index_function)
+        index_function.add_to_role_policy(iam.PolicyStatement(
+            actions=["dynamodb:Scan"],
+            resources=[f"arn:{self.partition}:dynamodb:{self.region}:{self.account}:table/{health_events_table_name}"]
+        ))
+        schedulerRole.add_to_policy(iam.PolicyStatement(
+            actions=["lambda:InvokeFunction"],
+            resources=[index_function.function_arn]
+        ))
+
+        scheduler.CfnSchedule(self,
+                              id="FleetIndexDailySchedule",
+                              name="FleetIndexDailySchedule",
+                              flexible_time_window=scheduler.CfnSchedule.FlexibleTimeWindowProperty(
+                                  mode="OFF"
+                              ),
+                              schedule_expression="cron(30 8 * * ? *)", # Runs every day at 08:30 UTC, after the health digest
+                              target=scheduler.CfnSchedule.TargetProperty(
+                                  arn=index_function.function_arn,
+                                  role_arn=schedulerRole.role_arn
+                              ))
         
         self.lambda_execution_role_arn = lambda_execution_role.role_arn
                 
@@ -30,9 +30,18 @@ class EksDiscoveryTemplate(Stack):
         discovery_cross_account_role.add_to_policy(
             iam.PolicyStatement(
                 actions=[
+                    "ec2:DescribeRegions",
                     "eks:ListClusters",
                     "eks:DescribeCluster",
                     "eks:ListTagsForResource",
+                    "eks:ListNodegroups",
+                    "eks:DescribeNodegroup",
+                    "eks:ListFargateProfiles",
+                    "eks:DescribeFargateProfile",
+                    "eks:ListAddons",
+                    "eks:DescribeAddon",
+                    "eks:DescribeAddonVersions",
+                    "tag:GetResources",
                 ],
                 resources=["*"],
             )
@@ -3,9 +3,13 @@ from aws_cdk import (
     Duration,    
     RemovalPolicy,
     Stack,    
+    aws_dynamodb as dynamodb,
     aws_events as events,
     aws_events_targets as targets,
     aws_iam as iam,
+    aws_lambda as lambda_,
+    aws_lambda_event_sources as event_sources,
+    aws_scheduler as scheduler,
     aws_sqs as sqs,
     aws_sns as sns    
 )
@@ -18,6 +22,7 @@ class EKSHealth(Stack):
                  construct_id: str, 
                  event_bus_name: str,
                  topic_name: str,
+                 table_name: str,
                  **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
@@ -37,43 +42,22 @@ class EKSHealth(Stack):
         )
         topic.apply_removal_policy(RemovalPolicy.DESTROY)
 
-        # Create EventBridge Rule to forward to SNS
-        event_rule = events.Rule(
-            self,
-            id="EKSHealthEventRuleSns",
-            event_bus=event_bus,
-            rule_name=f"{self.stack_name}-{self.region}-sns",
-            description="Send EKS planned lifecycle health events to SNS",
-            event_pattern=events.EventPattern(
-                source=["aws.health"],
-                detail_type=["AWS Health Event"],
-                detail={
-                    "service": ["EKS"],
-                    "eventTypeCategory": ["scheduledChange"],
-                    "eventTypeCode": ["AWS_EKS_PLANNED_LIFECYCLE_EVENT"],
-                },
-            ),
-            targets=[targets.SnsTopic(topic)]
-        )
-        
-        # Add necessary permissions to the SNS topic
-        topic.add_to_resource_policy(iam.PolicyStatement(
-            actions=["sns:Publish"],
-            principals=[iam.ServicePrincipal("events.amazonaws.com")],
-            resources=[topic.topic_arn],
-            conditions={
-                "ArnEquals": {
-                    "aws:SourceArn": event_rule.rule_arn
-                }
-            }
-        ))
-        
+        # Messages that keep failing are moved aside instead of being retried for the whole retention period
+        dead_letter_queue = sqs.Queue(self,
+                                      id="CentralHealthEventsDeadLetterQueue",
+                                      queue_name=f"{self.stack_name}-{topic_name}-dlq-{self.region}",
+                                      retention_period=Duration.days(14),
+                                      enforce_ssl=True)
+        dead_letter_queue.apply_removal_policy(RemovalPolicy.DESTROY)
+
         # Create SQS queue in the tooling account
         queue = sqs.Queue(self,
                           id="CentralHealthEventsQueue",
                           queue_name=f"{self.stack_name}-{topic_name}-{self.region}",
-                          visibility_timeout=Duration.seconds(30),
+                          # At least six times the consumer timeout, as recommended for Lambda event sources
+                          visibility_timeout=Duration.seconds(360),
                           retention_period=Duration.days(14),
+                          dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=dead_letter_queue),
                           enforce_ssl=True)
         queue.apply_removal_policy(RemovalPolicy.DESTROY)
         
@@ -109,4 +93,71 @@ class EKSHealth(Stack):
             }
         ))         
                     
+        # Health events received, keyed by event ARN and account so that each one is digested once.
+        # Events expire 400 days after their last update.
+        table = dynamodb.Table(self,
+                               id="HealthEventsTable",
+                               partition_key=dynamodb.Attribute(name="eventArn", type=dynamodb.AttributeType.STRING),
+                               sort_key=dynamodb.Attribute(name="accountId", type=dynamodb.AttributeType.STRING),
+                               table_name=table_name,
+                               billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                               time_to_live_attribute="expiresAt",
+                               removal_policy=RemovalPolicy.DESTROY)
+
+        consumer_function = lambda_.Function(
+            self,
+            "HealthEventsConsumer",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="health_digest.lambda_handler",
+            code=lambda_.Code.from_asset("../src"),
+            timeout=Duration.seconds(60),
+            environment={"HEALTH_EVENTS_TABLE": table.table_name}
+        )
+        table.grant_read_write_data(consumer_function)
+        consumer_function.add_event_source(event_sources.SqsEventSource(
+            queue,
+            batch_size=10,
+            max_batching_window=Duration.seconds(60),
+            report_batch_item_failures=True
+        ))
+
+        digest_function = lambda_.Function(
+            self,
+            "HealthEventsDigest",
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            handler="health_digest.digest_handler",
+            code=lambda_.Code.from_asset("../src"),
+            timeout=Duration.seconds(300),
+            memory_size=256,
+            environment={
+                "HEALTH_EVENTS_TABLE": table.table_name,
+                "SNS_TOPIC_ARN": topic.topic_arn
+            }
+        )
+        table.grant_read_write_data(digest_function)
+        topic.grant_publish(digest_function)
+
+        scheduler_role = iam.Role(
+            self,
+            "DigestSchedulerRole",
+            assumed_by=iam.ServicePrincipal("scheduler.amazonaws.com")
+        )
+        scheduler_role.add_to_policy(iam.PolicyStatement(
+            actions=["lambda:InvokeFunction"],
+            resources=[digest_function.function_arn]
+        ))
+
+        scheduler.CfnSchedule(self,
+                              id="HealthEventsDailyDigest",
+                              name=f"{self.stack_name}-daily-digest",
+                              flexible_time_window=scheduler.CfnSchedule.FlexibleTimeWindowProperty(
+                                  mode="OFF"
+                              ),
+                              schedule_expression="cron(0 8 * * ? *)", # Runs every day at 08:00 UTC
+                              target=scheduler.CfnSchedule.TargetProperty(
+                                  arn=digest_function.function_arn,
+                                  role_arn=scheduler_role.role_arn
+                              ))
+
         CfnOutput(self, "CentralEventBusArn", value=event_bus.event_bus_arn)
+        CfnOutput(self, "HealthEventsTableName", value=table.table_name)
@@ -12,7 +12,9 @@ EKSDiscovery(
     app,
     "eks-discovery-lambda",
     lambda_execution_role_name=constants.LAMBDA_EXECUTION_ROLE_NAME,
+    function_name=constants.DISCOVERY_FUNCTION_NAME,
     cross_account_role_name=constants.DISCOVERY_CROSS_ACCOUNT_ROLE_NAME,
+    health_events_table_name=constants.HEALTH_EVENTS_TABLE_NAME,
 )
 
 # Forward AWS Health events for EKS to SQS and SNS via an Event Bus
@@ -21,6 +23,7 @@ EKSHealth(
     "eks-health-events",
     event_bus_name=constants.CENTRAL_EVENT_BUS_NAME,
     topic_name=constants.SNS_TOPIC_NAME,
+    table_name=constants.HEALTH_EVENTS_TABLE_NAME,
 )
 
 app.synth()
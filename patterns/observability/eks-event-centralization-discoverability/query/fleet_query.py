@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# Queries the fleet index built by the fleet index function, which joins the
+# discovered EKS clusters with the AWS Health events received for them.
+#
+#   python3 fleet_query.py --bucket eks-discovery-<account>-<region> pending --param version=1.27
+#   python3 fleet_query.py --db fleet.db --sql "SELECT region, COUNT(*) FROM clusters GROUP BY region"
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lib.fleet import QUERIES, run_query
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Query the EKS fleet index")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--db', help="local copy of the index")
+    source.add_argument('--bucket', help="discovery bucket to download the index from")
+    parser.add_argument('--key', default='index/fleet.db', help="key of the index in the bucket")
+    parser.add_argument('--sql', help="run this SQL statement instead of a named query")
+    parser.add_argument('--param', action='append', default=[], help="query parameter as name=value, can be repeated")
+    parser.add_argument('--json', action='store_true', help="print the rows as JSON")
+    parser.add_argument('query', nargs='?', choices=sorted(QUERIES), help="named query, lists them when omitted")
+    return parser.parse_args()
+
+
+def open_index(args, directory):
+    if args.db:
+        return sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    import boto3
+    path = os.path.join(directory, 'fleet.db')
+    boto3.client('s3').download_file(args.bucket, args.key, path)
+    return sqlite3.connect(path)
+
+
+def print_table(columns, rows):
+    rows = [['' if value is None else str(value) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[index]) for row in rows]) for index, column in enumerate(columns)]
+    print('  '.join(column.ljust(width) for column, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)))
+
+
+def main():
+    args = parse_args()
+    if not args.sql and not args.query:
+        for name, (description, _) in sorted(QUERIES.items()):
+            print(f"{name:15} {description}")
+        return
+    if not args.db and not args.bucket:
+        sys.exit("Either --db or --bucket is required")
+
+    params = dict(param.split('=', 1) for param in args.param)
+    sql = args.sql or QUERIES[args.query][1]
+    with tempfile.TemporaryDirectory() as directory:
+        connection = open_index(args, directory)
+        try:
+            start = time.perf_counter()
+            columns, rows = run_query(connection, sql, params)
+            elapsed = time.perf_counter() - start
+        finally:
+            connection.close()
+
+    if args.json:
+        print(json.dumps([dict(zip(columns, row)) for row in rows], indent=2))
+    else:
+        print_table(columns, rows)
+        print(f"\n{len(rows)} row(s) in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
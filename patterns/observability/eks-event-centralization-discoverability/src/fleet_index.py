@@ -0,0 +1,38 @@
+import logging
+import os
+import tempfile
+
+import boto3
+
+from lib import inventory as cluster_inventory
+from lib.fleet import build_index
+from lib.health import HealthEventStore
+
+
+# Joins the latest discovery inventory with the stored AWS Health events into a
+# SQLite index and uploads it to the discovery bucket, for query/fleet_query.py
+def lambda_handler(event, context):
+    logger = logging.getLogger()
+    logger.setLevel("INFO")
+
+    s3_client = boto3.client('s3')
+    bucket = os.environ['S3_BUCKET_NAME']
+    index_key = os.environ.get('INDEX_KEY', 'index/fleet.db')
+
+    snapshot = cluster_inventory.open_store(s3_client, bucket).load()
+    events = []
+    if os.environ.get('HEALTH_EVENTS_TABLE'):
+        events = list(HealthEventStore(boto3.resource('dynamodb'), os.environ['HEALTH_EVENTS_TABLE']).scan())
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fleet.db')
+        build_index(path, snapshot, events)
+        s3_client.upload_file(path, bucket, index_key)
+
+    logger.info (f"Indexed {len(snapshot.get('clusters', {}))} cluster(s) and {len(events)} health event(s) to s3://{bucket}/{index_key}")
+    return {
+        'statusCode': 200,
+        'clusters': len(snapshot.get('clusters', {})),
+        'events': len(events),
+        'index': f"s3://{bucket}/{index_key}"
+    }
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import boto3
+
+from lib.health import HealthEventStore, event_item
+
+# SNS messages are limited to 256 KB, leave room for the header of every part
+MAX_MESSAGE_BYTES = 200 * 1024
+MAX_SUMMARY_LENGTH = 300
+
+logger = logging.getLogger()
+logger.setLevel("INFO")
+
+
+# Consumes the central Health events queue in batches. New events and later
+# updates of stored events are written to the events table, events already seen
+# are dropped, and the messages that could not be processed are reported back so
+# that only they are retried by SQS.
+def lambda_handler(event, context):
+    store = HealthEventStore(boto3.resource('dynamodb'), os.environ['HEALTH_EVENTS_TABLE'])
+    failures = []
+    stored = 0
+    for record in event['Records']:
+        try:
+            if store.add(event_item(json.loads(record['body']))):
+                stored += 1
+        except Exception as error:
+            logger.error(f"Failed to process message {record['messageId']}: {str(error)}")
+            failures.append({'itemIdentifier': record['messageId']})
+    logger.info(f"Stored {stored} new or updated event(s) out of {len(event['Records'])} message(s), {len(failures)} failure(s)")
+    return {'batchItemFailures': failures}
+
+
+# Runs on a schedule, publishes one digest per account of the events stored since
+# the previous digest, grouped by cluster, instead of one notification per event
+def digest_handler(event, context):
+    store = HealthEventStore(boto3.resource('dynamodb'), os.environ['HEALTH_EVENTS_TABLE'])
+    sns = boto3.client('sns')
+    pending = list(store.scan(pending_only=True))
+    if not pending:
+        logger.info("No new health events to digest")
+        return {'statusCode': 200, 'accounts': 0, 'events': 0}
+
+    by_account = defaultdict(list)
+    for item in pending:
+        by_account[item['accountId']].append(item)
+
+    for account_id, items in sorted(by_account.items()):
+        by_cluster = defaultdict(list)
+        for item in items:
+            for cluster in item['clusters'] or ['(no cluster reported)']:
+                by_cluster[cluster].append(item)
+        sections = [cluster_section(cluster, events) for cluster, events in sorted(by_cluster.items())]
+        subject = f"EKS lifecycle events: {len(by_cluster)} cluster(s) in account {account_id}"
+        parts = split_message(sections)
+        for index, body in enumerate(parts, start=1):
+            header = f"{len(items)} new AWS Health event(s) for {len(by_cluster)} EKS cluster(s) in account {account_id}"
+            if len(parts) > 1:
+                header += f" (part {index} of {len(parts)})"
+            sns.publish(
+                TopicArn=os.environ['SNS_TOPIC_ARN'],
+                Subject=subject[:100],
+                Message=f"{header}\n\n{body}"
+            )
+        store.mark_digested(items, datetime.now(timezone.utc).isoformat())
+        logger.info(f"Published digest of {len(items)} event(s) for account {account_id} in {len(parts)} message(s)")
+
+    return {'statusCode': 200, 'accounts': len(by_account), 'events': len(pending)}
+
+
+def cluster_section(cluster, events):
+    lines = [cluster]
+    for item in sorted(events, key=lambda item: item.get('startTime') or ''):
+        summary = ' '.join(item.get('description', '').split())[:MAX_SUMMARY_LENGTH]
+        lines.append(f"  - {item['eventTypeCode']} in {item['region']} starting {item.get('startTime') or 'n/a'}: {summary}")
+    return '\n'.join(lines)
+
+
+def split_message(sections):
+    parts = [[]]
+    size = 0
+    for section in sections:
+        section_size = len(section.encode('utf-8')) + 2
+        if parts[-1] and size + section_size > MAX_MESSAGE_BYTES:
+            parts.append([])
+            size = 0
+        parts[-1].append(section)
+        size += section_size
+    return ['\n\n'.join(part) for part in parts]
@@ -1,17 +1,38 @@
 import boto3
+import botocore
 import json
-import io
-import zipfile
-import csv
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 import logging
+import time
+from lib.scan import ScanEngine, DeadlineExceeded
+from lib.backends import open_backend
+from lib import deep_inventory
+from lib import checkpoint
+from lib.credentials import CredentialBroker
+from lib import inventory as cluster_inventory
+from lib.regions import RegionIndex, enabled_regions
+from lib.metrics import metrics
+from lib.report import S3MultipartWriter, write_report, write_parquet, write_ndjson
+
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '32'))
+PER_ACCOUNT_WORKERS = int(os.environ.get('PER_ACCOUNT_WORKERS', '4'))
+OUTPUT_FORMAT = os.environ.get('OUTPUT_FORMAT', 'csv')
+INVENTORY_MAX_AGE_HOURS = int(os.environ.get('INVENTORY_MAX_AGE_HOURS', '24'))
+REGION_RECHECK_HOURS = int(os.environ.get('REGION_RECHECK_HOURS', '168'))
+CHECKPOINT_RESERVE_SECONDS = int(os.environ.get('CHECKPOINT_RESERVE_SECONDS', '120'))
+# 'invoke' starts the follow-up invocation itself, 'none' leaves it to the caller,
+# e.g. a Step Functions loop passing the returned runId back in
+CONTINUATION = os.environ.get('CONTINUATION', 'invoke')
+# Adds the managed node groups, Fargate profiles and add-ons of every cluster to the report
+DEEP_INVENTORY = os.environ.get('DEEP_INVENTORY', 'false').lower() == 'true'
 
 def lambda_handler(event, context):
     # Setup logging
     logger = logging.getLogger()
     logger.setLevel("INFO")
+    metrics.reset()
 
     # Initialize AWS clients
     sts_client = boto3.client('sts')
@@ -25,113 +46,151 @@ def lambda_handler(event, context):
     s3_bucket_name = os.environ['S3_BUCKET_NAME']
     cross_account_role_name = os.environ['CROSS_ACCOUNT_ROLE_NAME']
 
-    cluster_info = []
     version_counts = defaultdict(int)
 
     # Get current account ID and list of all AWS regions
     current_account_id = sts_client.get_caller_identity()['Account']
+    for client in (sts_client, organizations, s3_client, sns_client, ec2_client):
+        metrics.instrument(client, current_account_id)
     all_regions = [region['RegionName'] for region in ec2_client.describe_regions()['Regions']]
 
-    # List all active accounts in the organization 
-    accounts = []
-    page_iterator = organizations.get_paginator('list_accounts').paginate()
-    for page in page_iterator:
-        accounts.extend(page['Accounts'])
-    active_accounts = [account for account in accounts if account['Status'] == 'ACTIVE']
+    # Load the inventory of the previous run, unchanged clusters are not described again
+    store = cluster_inventory.open_store(s3_client, s3_bucket_name)
+    with metrics.phase('InventoryLoad'):
+        previous_snapshot = store.load()
+    inventory = cluster_inventory.Inventory(previous_snapshot, INVENTORY_MAX_AGE_HOURS)
+    region_index = RegionIndex(previous_snapshot.get('regions', {}), REGION_RECHECK_HOURS)
 
-    # Iterate through all accounts
-    account_count = 0
-    skipped_count = 0
-    for account in active_accounts:
-        logger.info (f"Discovering EKS clusters in account {account['Id']}")
-        account_count += 1        
-        if account['Id'] == current_account_id:
-            session = boto3.Session()
-        else:
-            # Assume role in other active accounts
-            try:
-                assumed_role_object = sts_client.assume_role(
-                    RoleArn=f"arn:aws:iam::{account['Id']}:role/{cross_account_role_name}",
-                    RoleSessionName="AssumeRoleSession1"
-                )
-                credentials = assumed_role_object['Credentials']
-                session = boto3.Session(
-                    aws_access_key_id=credentials['AccessKeyId'],
-                    aws_secret_access_key=credentials['SecretAccessKey'],
-                    aws_session_token=credentials['SessionToken']
-                )
-            except Exception as e:
-                skipped_count += 1
-                logger.warning(f"Error assuming role in account {account['Id']}")
-                logger.warning({str(e)})
-                logger.warning(f"This is the expected result if {account['Id']} is a management account and this Lambda function is run from a non-management account")
-                continue
-
-        cluster_count = 0
-        # Iterate through all regions
-        for region in all_regions:
-            try:
-                eks = session.client('eks', region_name=region)
-                clusters = []
-                page_iterator = eks.get_paginator('list_clusters').paginate()
-                for page in page_iterator:
-                    clusters.extend(page['clusters'])
-               
-                # Collect information for each EKS cluster
-                for cluster_name in clusters:
-                    cluster_details = eks.describe_cluster(name=cluster_name)['cluster']
-                    cluster_version = cluster_details['version']
-                    cluster_arn = cluster_details['arn']
-                    tags = cluster_details['tags']                                     
-                    cluster_info.append({
-                        'accountId': account['Id'],
-                        'accountName': account['Name'],
-                        'region': region,
-                        'clusterName': cluster_name,
-                        'clusterArn': cluster_arn,
-                        'clusterVersion': cluster_version,
-                        'tags': json.dumps(tags)
-                    })
-                    version_counts[cluster_version] += 1
-                    cluster_count += 1
-                
-            except Exception as e:
-                logger.error(f"Error processing region {region} in account {account['Id']}: {str(e)}")
-
-        logger.info (f"EKS cluster(s) in account {account['Id']} = {cluster_count}")
+    engine = ScanEngine(MAX_WORKERS, PER_ACCOUNT_WORKERS)
+    broker = CredentialBroker(engine, sts_client, current_account_id, cross_account_role_name)
+    backend = open_backend(engine, current_account_id)
 
-    if not cluster_info:
-        logger.info ("No EKS clusters found.")
-        message = "No EKS clusters found."
+    # A run that did not finish within one invocation is resumed from its checkpoint
+    checkpoints = checkpoint.open_store(s3_client, s3_bucket_name)
+    run_id = event.get('runId') if isinstance(event, dict) else None
+    state = checkpoints.load(run_id, 'state') if run_id else None
+    if state is None:
+        run_id = checkpoint.new_run_id()
+        state, tasks, account_sessions, located = start_run(engine, broker, organizations, region_index, all_regions, inventory, backend)
     else:
-        # Prepare CSV data for cluster details and version counts
-        cluster_details_csv = io.StringIO()
-        cluster_details_writer = csv.DictWriter(cluster_details_csv, fieldnames=cluster_info[0].keys())
-        cluster_details_writer.writeheader()
-        cluster_details_writer.writerows(cluster_info)
-
-        version_counts_csv = io.StringIO()
-        version_counts_writer = csv.writer(version_counts_csv)
-        version_counts_writer.writerow(['clusterVersion', 'count'])
-        for version, count in version_counts.items():
-            version_counts_writer.writerow([version, count])
-
-        # Create a zip file with both CSVs
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, mode='w') as zip_file:
-            zip_file.writestr('cluster_details.csv', cluster_details_csv.getvalue())
-            zip_file.writestr('version_counts.csv', version_counts_csv.getvalue())
-        zip_buffer.seek(0)
-
-        # Upload zip file to S3
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        s3_key = f'cluster_info_all_accounts_{timestamp}.zip'
+        logger.info (f"Resuming discovery run {run_id} with {len(state['pending'])} account region(s) left")
+        tasks, account_sessions = resume_run(broker, state)
+        located = {}
+    account_count = state['accountCount']
+    skipped_count = state['skippedCount']
+
+    # Scan every account and region concurrently, results come back in task order.
+    # Leave enough time to checkpoint or render the report before the function times out.
+    deadline = None
+    if context is not None:
+        deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - CHECKPOINT_RESERVE_SECONDS
+    with metrics.phase('RegionScan'):
+        results = engine.scan(lambda account, region: run_task(engine, account, account_sessions, region, inventory, located),
+                              tasks,
+                              account_key=lambda account: account['Id'],
+                              deadline=deadline)
+
+    partial = {'entries': {}, 'scanned': [], 'describedCount': 0}
+    pending = []
+    for (account, region), (clusters, error) in zip(tasks, results):
+        if isinstance(error, DeadlineExceeded):
+            pending.append([account['Id'], region])
+            continue
+        if error:
+            logger.error(f"Error processing region {region} in account {account['Id']}: {str(error)}")
+            continue
+        partial['scanned'].append([account['Id'], region, len(clusters)])
+        for arn, entry, described in clusters:
+            partial['entries'][arn] = entry
+            partial['describedCount'] += described
+
+    if pending:
+        # Checkpoint what was scanned so far and hand the rest to a follow-up invocation
+        with metrics.phase('Checkpoint'):
+            checkpoints.save(run_id, f"part-{state['parts']}", partial)
+            state['parts'] += 1
+            state['pending'] = pending
+            checkpoints.save(run_id, 'state', state)
+        logger.info (f"Checkpointed discovery run {run_id}, {len(pending)} account region(s) left")
+        if CONTINUATION == 'invoke':
+            boto3.client('lambda').invoke(
+                FunctionName=context.invoked_function_arn,
+                InvocationType='Event',
+                Payload=json.dumps({'runId': run_id}).encode('utf-8')
+            )
+        metrics.emit(runId=run_id, accounts=account_count, skippedAccounts=skipped_count, pendingRegions=len(pending))
+        return {
+            'statusCode': 202,
+            'runId': run_id,
+            'complete': False,
+            'body': json.dumps(f"EKS cluster discovery run {run_id} checkpointed with {len(pending)} account region(s) left to scan.")
+        }
+
+    # Assemble the results of every invocation of the run
+    parts = [checkpoints.load(run_id, f"part-{index}") for index in range(state['parts'])] + [partial]
+    entries = {}
+    scanned = set()
+    described_count = 0
+    for part in parts:
+        entries.update(part['entries'])
+        described_count += part['describedCount']
+        for account_id, region, cluster_count in part['scanned']:
+            scanned.add((account_id, region))
+            region_index.record(account_id, region, cluster_count)
+    active_account_ids = {account['Id'] for account in state['accounts']}
+
+    snapshot, delta = inventory.update(entries, scanned, active_account_ids)
+    snapshot['regions'] = region_index.history
+    if DEEP_INVENTORY:
+        with metrics.phase('DeepInventory'):
+            collect_deep_inventory(engine, broker, snapshot, deadline)
+    with metrics.phase('InventorySave'):
+        store.save(snapshot)
+    logger.info (f"Described {described_count} EKS cluster(s), reused {len(entries) - described_count} from the inventory")
+    logger.info (f"Inventory delta: {len(delta['added'])} added, {len(delta['removed'])} removed, {len(delta['changed'])} changed")
+
+    cluster_info = sorted((dict(entry['row'], **entry.get('deep', deep_inventory.EMPTY)) if DEEP_INVENTORY else entry['row']
+                           for entry in snapshot['clusters'].values()),
+                          key=lambda row: (row['accountId'], row['region'], row['clusterName']))
+    cluster_counts = defaultdict(int)
+    for cluster in cluster_info:
+        version_counts[cluster['clusterVersion']] += 1
+        cluster_counts[cluster['accountId']] += 1
+
+    for account_id in sorted(active_account_ids):
+        logger.info (f"EKS cluster(s) in account {account_id} = {cluster_counts[account_id]}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if any(delta.values()):
+        # Upload the changes since the previous run next to the report
         s3_client.put_object(
             Bucket=s3_bucket_name,
-            Key=s3_key,
-            Body=zip_buffer.getvalue()
+            Key=f'cluster_delta_{timestamp}.json',
+            Body=json.dumps(delta).encode('utf-8')
         )
 
+    if not cluster_info:
+        logger.info ("No EKS clusters found.")
+        message = "No EKS clusters found."
+    else:
+        # Stream the report to S3 as it is written
+        snapshot_time = datetime.now(timezone.utc)
+        snapshot_date = snapshot_time.strftime("%Y-%m-%d")
+        with metrics.phase('Report'):
+            if OUTPUT_FORMAT == 'parquet':
+                s3_key = f'reports/parquet/snapshot_date={snapshot_date}/cluster_details_{timestamp}.parquet'
+                with S3MultipartWriter(s3_client, s3_bucket_name, s3_key) as report:
+                    write_parquet(report, cluster_info, snapshot_time)
+            elif OUTPUT_FORMAT == 'ndjson':
+                s3_key = f'reports/ndjson/snapshot_date={snapshot_date}/'
+                write_ndjson(lambda region: S3MultipartWriter(s3_client, s3_bucket_name, f'{s3_key}region={region}/cluster_details_{timestamp}.ndjson.gz'),
+                             cluster_info,
+                             snapshot_time)
+            else:
+                s3_key = f'cluster_info_all_accounts_{timestamp}.zip'
+                with S3MultipartWriter(s3_client, s3_bucket_name, s3_key) as report:
+                    write_report(report, cluster_info, version_counts)
+
         # Send SNS notification
         s3_object_url = f"https://{s3_bucket_name}.s3.amazonaws.com/{s3_key}"
         sns_client.publish(
@@ -140,8 +199,237 @@ def lambda_handler(event, context):
             Message=f'Please find the cluster information for all accounts at: {s3_object_url}'
         )
 
+    if state['parts']:
+        checkpoints.delete(run_id, ['state'] + [f"part-{index}" for index in range(state['parts'])])
+
+    metrics.emit(runId=run_id, accounts=account_count, skippedAccounts=skipped_count, clusters=len(cluster_info), describedClusters=described_count)
+
     return {
         'statusCode': 200,
+        'runId': run_id,
+        'complete': True,
         'body': json.dumps(f"EKS cluster discovery complete. Attempted scan of {account_count} account(s). Skipped {skipped_count} account(s). Found {len(cluster_info)} EKS cluster(s).")
     }
 
+
+
+# Lists the active accounts, assumes role in each of them and selects the regions
+# to scan. Returns the initial run state, the scan tasks, the account sessions and
+# the clusters located by the discovery backend, keyed by account region.
+def start_run(engine, broker, organizations, region_index, all_regions, inventory, backend):
+    logger = logging.getLogger()
+
+    # List all active accounts in the organization 
+    accounts = []
+    with metrics.phase('ListAccounts'):
+        page_iterator = organizations.get_paginator('list_accounts').paginate()
+        for page in page_iterator:
+            accounts.extend(page['Accounts'])
+    active_accounts = [account for account in accounts if account['Status'] == 'ACTIVE']
+    skipped_count = 0
+
+    # Locate the clusters through the aggregated inventory first. Account regions it
+    # covers are only touched to describe new or changed clusters. The gaps it reports,
+    # the enabled regions it does not report and the accounts it does not cover at all
+    # fall back to the per-account scan.
+    located = {}
+    gaps = {}
+    if backend is not None:
+        with metrics.phase('Locate'):
+            located, gaps = backend.locate([account['Id'] for account in active_accounts])
+        logger.info (f"Discovery backend located {sum(len(clusters) for clusters in located.values())} EKS cluster(s) in {len(located)} account region(s), {sum(len(regions) for regions in gaps.values())} account region(s) left to scan")
+    reported_regions = defaultdict(set)
+    for account_id, region in located:
+        reported_regions[account_id].add(region)
+    for account_id, regions in gaps.items():
+        reported_regions[account_id].update(regions)
+
+    # Assume role in every account concurrently, the enabled regions of covered
+    # accounts are needed as well to find the regions the backend does not report
+    with metrics.phase('AssumeRole'):
+        sessions = broker.prepare([account['Id'] for account in active_accounts])
+    account_sessions = {}
+    for account, (session, error) in zip(active_accounts, sessions):
+        if error:
+            skipped_count += 1
+            logger.warning(f"Error assuming role in account {account['Id']}")
+            logger.warning({str(error)})
+            logger.warning(f"This is the expected result if {account['Id']} is a management account and this Lambda function is run from a non-management account")
+        else:
+            logger.info (f"Discovering EKS clusters in account {account['Id']}")
+            account_sessions[account['Id']] = session
+
+    # Only scan the regions each account has enabled, skipping regions that were
+    # empty in earlier runs until they are due for a recheck
+    scanned_account_ids = [account['Id'] for account in active_accounts if account['Id'] in account_sessions]
+    with metrics.phase('EnabledRegions'):
+        account_regions = engine.map(lambda account_id: enabled_regions(engine, account_sessions[account_id]), scanned_account_ids)
+    regions_by_account = {}
+    for account_id, (regions, _) in zip(scanned_account_ids, account_regions):
+        unreported = [region for region in regions or all_regions if region not in reported_regions[account_id]]
+        regions_by_account[account_id] = region_index.regions_to_scan(account_id, unreported) + sorted(gaps.get(account_id, []))
+    logger.info (f"Scanning {sum(len(regions) for regions in regions_by_account.values())} of {len(scanned_account_ids) * len(all_regions)} account region(s)")
+
+    # Located account regions whose account could not be assumed are not scanned,
+    # their clusters are carried over from the previous inventory
+    located = {key: clusters for key, clusters in located.items()
+               if key[0] in account_sessions or not needs_describe(inventory, key[0], key[1], clusters)}
+    for account_id, region in located:
+        regions_by_account.setdefault(account_id, []).append(region)
+    tasks = [(account, region) for account in active_accounts for region in regions_by_account.get(account['Id'], [])]
+    state = {
+        'accounts': [{'Id': account['Id'], 'Name': account['Name']} for account in active_accounts],
+        'accountCount': len(active_accounts),
+        'skippedCount': skipped_count,
+        'parts': 0,
+    }
+    return state, tasks, account_sessions, located
+
+
+# Rebuilds the scan tasks and account sessions for the regions left by a checkpoint
+def resume_run(broker, state):
+    logger = logging.getLogger()
+    accounts = {account['Id']: account for account in state['accounts']}
+    account_ids = sorted({account_id for account_id, _ in state['pending']})
+    with metrics.phase('AssumeRole'):
+        sessions = broker.prepare(account_ids)
+    account_sessions = {}
+    for account_id, (session, error) in zip(account_ids, sessions):
+        if error:
+            logger.error(f"Error assuming role in account {account_id}: {str(error)}")
+        else:
+            account_sessions[account_id] = session
+    tasks = [(accounts[account_id], region) for account_id, region in state['pending'] if account_id in account_sessions]
+    return tasks, account_sessions
+
+
+# Account regions located by the discovery backend only describe the clusters
+# that changed, every other account region is scanned
+def run_task(engine, account, account_sessions, region, inventory, located):
+    clusters = located.get((account['Id'], region))
+    if clusters is not None:
+        return describe_clusters(engine, account, account_sessions.get(account['Id']), region, inventory, clusters)
+    return scan_region(engine, account, account_sessions[account['Id']], region, inventory)
+
+
+def scan_region(engine, account, account_session, region, inventory):
+    eks = account_session.client('eks', region)
+    cluster_names = []
+    kwargs = {}
+    while True:
+        page = engine.call('eks', eks.list_clusters, **kwargs)
+        cluster_names.extend(page['clusters'])
+        if not page.get('nextToken'):
+            break
+        kwargs['nextToken'] = page['nextToken']
+    if not cluster_names:
+        return []
+
+    cluster_tags = list_cluster_tags(engine, account_session.client('resourcegroupstaggingapi', region))
+    if cluster_tags is None:
+        clusters = {cluster_name: None for cluster_name in cluster_names}
+    else:
+        clusters = {cluster_name: cluster_tags.get(cluster_inventory.cluster_arn(account['Id'], region, cluster_name), {})
+                    for cluster_name in cluster_names}
+    return describe_clusters(engine, account, account_session, region, inventory, clusters)
+
+
+# True when any of the clusters, given as name to tags (None when unknown), has
+# to be described rather than reused from the inventory
+def needs_describe(inventory, account_id, region, clusters):
+    for cluster_name, tags in clusters.items():
+        if tags is None:
+            return True
+        arn = cluster_inventory.cluster_arn(account_id, region, cluster_name)
+        if inventory.cached(arn, cluster_inventory.fingerprint(cluster_name, tags)) is None:
+            return True
+    return False
+
+
+# Collect information for each new or changed EKS cluster, clusters are given as
+# name to tags, None when the tags are unknown and the cluster is always described
+def describe_clusters(engine, account, account_session, region, inventory, clusters):
+    cluster_info = []
+    for cluster_name, tags in clusters.items():
+        arn = cluster_inventory.cluster_arn(account['Id'], region, cluster_name)
+        fingerprint = cluster_inventory.fingerprint(cluster_name, tags) if tags is not None else None
+        entry = inventory.cached(arn, fingerprint) if fingerprint else None
+        if entry is not None:
+            entry['row']['accountName'] = account['Name']
+            cluster_info.append((arn, entry, False))
+            continue
+
+        eks = account_session.client('eks', region)
+        cluster_details = engine.call('eks', eks.describe_cluster, name=cluster_name)['cluster']
+        cluster_logging = cluster_details.get('logging', {}).get('clusterLogging', [])
+        vpc_config = cluster_details.get('resourcesVpcConfig', {})
+        row = {
+            'accountId': account['Id'],
+            'accountName': account['Name'],
+            'region': region,
+            'clusterName': cluster_name,
+            'clusterArn': cluster_details['arn'],
+            'clusterVersion': cluster_details['version'],
+            'tags': cluster_details.get('tags', {}),
+            'platformVersion': cluster_details.get('platformVersion'),
+            'status': cluster_details.get('status'),
+            'endpointPublicAccess': vpc_config.get('endpointPublicAccess'),
+            'endpointPrivateAccess': vpc_config.get('endpointPrivateAccess'),
+            'enabledLogTypes': sorted(log_type for setting in cluster_logging if setting.get('enabled') for log_type in setting['types']),
+            'createdAt': cluster_details['createdAt'].isoformat() if cluster_details.get('createdAt') else None
+        }
+        fingerprint = cluster_inventory.fingerprint(cluster_name, row['tags'])
+        cluster_info.append((cluster_details['arn'], inventory.entry(row, fingerprint), True))
+    return cluster_info
+
+
+# Collects the node groups, Fargate profiles and add-ons of the clusters described
+# this run, and of the clusters carried over without them, one task per cluster
+# under the same worker limits and service backoff as the region scan. The add-on
+# versions are fetched once per region. Clusters not reached before the deadline
+# are collected by the next run.
+def collect_deep_inventory(engine, broker, snapshot, deadline):
+    logger = logging.getLogger()
+    entries = [entry for entry in snapshot['clusters'].values() if 'deep' not in entry]
+    account_ids = sorted({entry['row']['accountId'] for entry in entries})
+    account_sessions = {}
+    for account_id, (session, error) in zip(account_ids, broker.prepare(account_ids)):
+        if error:
+            logger.error(f"Error assuming role in account {account_id} for the deep inventory: {str(error)}")
+        else:
+            account_sessions[account_id] = session
+
+    catalog = deep_inventory.AddonCatalog(engine)
+    tasks = [(entry['row']['accountId'], entry) for entry in entries if entry['row']['accountId'] in account_sessions]
+    results = engine.scan(lambda account_id, entry: deep_inventory.collect(engine, account_sessions[account_id], entry['row'], catalog),
+                          tasks,
+                          deadline=deadline)
+    collected = 0
+    for (_, entry), (deep, error) in zip(tasks, results):
+        if isinstance(error, DeadlineExceeded):
+            continue
+        if error:
+            logger.error(f"Error collecting the deep inventory of {entry['row']['clusterArn']}: {str(error)}")
+            continue
+        entry['deep'] = deep
+        collected += 1
+    logger.info (f"Collected the deep inventory of {collected} of {len(entries)} EKS cluster(s)")
+
+
+# Tags of every cluster in the region with a single paginated call, None when
+# the tagging API cannot be used and every cluster has to be described
+def list_cluster_tags(engine, tagging):
+    cluster_tags = {}
+    kwargs = {'ResourceTypeFilters': ['eks:cluster']}
+    try:
+        while True:
+            page = engine.call('tagging', tagging.get_resources, **kwargs)
+            for resource in page['ResourceTagMappingList']:
+                cluster_tags[resource['ResourceARN']] = {tag['Key']: tag['Value'] for tag in resource['Tags']}
+            if not page.get('PaginationToken'):
+                break
+            kwargs['PaginationToken'] = page['PaginationToken']
+    except botocore.exceptions.ClientError as error:
+        logging.getLogger().warning(f"Unable to list cluster tags, describing every cluster: {str(error)}")
+        return None
+    return cluster_tags
@@ -0,0 +1,142 @@
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import boto3
+
+from lib.metrics import metrics
+from lib.scan import CLIENT_CONFIG
+
+CONFIG_QUERY = "SELECT accountId, awsRegion, resourceName, tags WHERE resourceType = 'AWS::EKS::Cluster'"
+RESOURCE_EXPLORER_QUERY = "resourcetype:eks:cluster"
+# Resource Explorer returns at most this many results for a single query
+RESOURCE_EXPLORER_MAX_RESULTS = 1000
+
+
+# Locates every EKS cluster of the organization through an AWS Config aggregator.
+# The aggregator sources status tells which account regions are aggregated and
+# how recently, account regions that failed or are outdated are left as gaps.
+class ConfigAggregatorBackend:
+    def __init__(self, engine, config_client, aggregator_name, max_age_hours):
+        self.engine = engine
+        self.config_client = config_client
+        self.aggregator_name = aggregator_name
+        self.max_age = timedelta(hours=max_age_hours)
+
+    def locate(self, account_ids):
+        account_ids = set(account_ids)
+        now = datetime.now(timezone.utc)
+        located = {}
+        gaps = {}
+        kwargs = {'ConfigurationAggregatorName': self.aggregator_name}
+        while True:
+            page = self.engine.call('config', self.config_client.describe_configuration_aggregator_sources_status, **kwargs)
+            for source in page['AggregatedSourceStatusList']:
+                account_id, region = source.get('SourceId'), source.get('AwsRegion')
+                if account_id not in account_ids or not region:
+                    continue
+                updated = source.get('LastUpdateTime')
+                if source.get('LastUpdateStatus') == 'SUCCEEDED' and updated and now - updated <= self.max_age:
+                    located[(account_id, region)] = {}
+                else:
+                    gaps.setdefault(account_id, []).append(region)
+            if not page.get('NextToken'):
+                break
+            kwargs['NextToken'] = page['NextToken']
+
+        kwargs = {'ConfigurationAggregatorName': self.aggregator_name, 'Expression': CONFIG_QUERY, 'Limit': 100}
+        while True:
+            page = self.engine.call('config', self.config_client.select_aggregate_resource_config, **kwargs)
+            for result in page['Results']:
+                resource = json.loads(result)
+                key = (resource['accountId'], resource['awsRegion'])
+                if key in located:
+                    located[key][resource['resourceName']] = {tag['key']: tag['value'] for tag in resource.get('tags') or []}
+            if not page.get('NextToken'):
+                break
+            kwargs['NextToken'] = page['NextToken']
+        return located, gaps
+
+
+# Locates every EKS cluster of the organization through a multi-account Resource
+# Explorer view. The member indexes tell which account regions are indexed. A
+# query is capped at RESOURCE_EXPLORER_MAX_RESULTS, so larger fleets are queried
+# region by region and a region that is still incomplete is left as a gap.
+class ResourceExplorerBackend:
+    def __init__(self, engine, explorer_client, view_arn):
+        self.engine = engine
+        self.explorer_client = explorer_client
+        self.view_arn = view_arn
+
+    def locate(self, account_ids):
+        account_ids = sorted(set(account_ids))
+        located = {}
+        gaps = {}
+        # AccountIdList accepts at most 10 accounts
+        for start in range(0, len(account_ids), 10):
+            kwargs = {'AccountIdList': account_ids[start:start + 10]}
+            while True:
+                page = self.engine.call('resource-explorer', self.explorer_client.list_indexes_for_members, **kwargs)
+                for index in page['Indexes']:
+                    located[(index['AccountId'], index['Region'])] = {}
+                if not page.get('NextToken'):
+                    break
+                kwargs['NextToken'] = page['NextToken']
+
+        resources, complete = self._search(RESOURCE_EXPLORER_QUERY)
+        if not complete:
+            resources = []
+            for region in sorted({region for _, region in located}):
+                region_resources, complete = self._search(f"{RESOURCE_EXPLORER_QUERY} region:{region}")
+                if complete:
+                    resources.extend(region_resources)
+                    continue
+                for key in [key for key in located if key[1] == region]:
+                    del located[key]
+                    gaps.setdefault(key[0], []).append(region)
+
+        for resource in resources:
+            key = (resource['OwningAccountId'], resource['Region'])
+            if key in located:
+                located[key][resource['Arn'].split('/')[-1]] = _resource_tags(resource)
+        return located, gaps
+
+    def _search(self, query):
+        resources = []
+        kwargs = {'QueryString': query, 'ViewArn': self.view_arn}
+        while True:
+            page = self.engine.call('resource-explorer', self.explorer_client.search, **kwargs)
+            resources.extend(page['Resources'])
+            if not page.get('NextToken'):
+                break
+            kwargs['NextToken'] = page['NextToken']
+        count = page.get('Count', {})
+        return resources, count.get('Complete', True) and len(resources) < RESOURCE_EXPLORER_MAX_RESULTS
+
+
+# Tags are only returned when the view includes them, None then means unknown
+def _resource_tags(resource):
+    for prop in resource.get('Properties') or []:
+        if prop['Name'] == 'tags':
+            return {tag['Key']: tag['Value'] for tag in prop['Data']}
+    return None
+
+
+# DISCOVERY_BACKEND selects how clusters are located: 'scan' (default) lists the
+# clusters of every account region, 'config' and 'resource-explorer' query an
+# aggregated inventory and only scan the account regions it does not cover
+def open_backend(engine, account_id):
+    backend = os.environ.get('DISCOVERY_BACKEND', 'scan')
+    if backend == 'config':
+        client = boto3.client('config', config=CLIENT_CONFIG)
+        metrics.instrument(client, account_id)
+        return ConfigAggregatorBackend(engine,
+                                       client,
+                                       os.environ['CONFIG_AGGREGATOR_NAME'],
+                                       int(os.environ.get('INVENTORY_MAX_AGE_HOURS', '24')))
+    if backend == 'resource-explorer':
+        view_arn = os.environ['RESOURCE_EXPLORER_VIEW_ARN']
+        client = boto3.client('resource-explorer-2', region_name=view_arn.split(':')[3], config=CLIENT_CONFIG)
+        metrics.instrument(client, account_id)
+        return ResourceExplorerBackend(engine, client, view_arn)
+    return None
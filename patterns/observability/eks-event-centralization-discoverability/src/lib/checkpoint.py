@@ -0,0 +1,77 @@
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+import botocore
+
+
+# Checkpoints of a discovery run that is split across several invocations, kept
+# under runs/<run id>/ in the discovery bucket
+class S3CheckpointStore:
+    def __init__(self, s3_client, bucket, prefix='runs/'):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _key(self, run_id, name):
+        return f"{self.prefix}{run_id}/{name}.json"
+
+    def load(self, run_id, name):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(run_id, name))
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise error
+        return json.loads(response['Body'].read())
+
+    def save(self, run_id, name, data):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(run_id, name),
+            Body=json.dumps(data).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+    def delete(self, run_id, names):
+        for name in names:
+            self.s3_client.delete_object(Bucket=self.bucket, Key=self._key(run_id, name))
+
+
+class LocalCheckpointStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, run_id, name):
+        return os.path.join(self.directory, run_id, f"{name}.json")
+
+    def load(self, run_id, name):
+        path = self._path(run_id, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, run_id, name, data):
+        path = self._path(run_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f)
+
+    def delete(self, run_id, names):
+        for name in names:
+            path = self._path(run_id, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# CHECKPOINT_PATH selects a local directory, which is handy when running outside of Lambda
+def open_store(s3_client, bucket):
+    if os.environ.get('CHECKPOINT_PATH'):
+        return LocalCheckpointStore(os.environ['CHECKPOINT_PATH'])
+    return S3CheckpointStore(s3_client, bucket)
+
+
+def new_run_id():
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{uuid.uuid4().hex[:8]}"
@@ -0,0 +1,93 @@
+import threading
+
+import boto3
+import botocore.session
+from botocore.credentials import RefreshableCredentials
+
+from lib.metrics import metrics
+from lib.scan import CLIENT_CONFIG
+
+ROLE_SESSION_NAME = "EKSDiscovery"
+
+# Sessions and clients live at module level so that warm invocations reuse
+# them, keyed by the role ARN (None for the tooling account itself)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class AccountSession:
+    def __init__(self, account_id, session):
+        self.account_id = account_id
+        self.session = session
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    # boto3 sessions are not thread safe, clients are, so only creation is serialized
+    def client(self, service, region):
+        key = (service, region)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self.session.client(service, region_name=region, config=CLIENT_CONFIG)
+                    metrics.instrument(client, self.account_id)
+                    self._clients[key] = client
+        return client
+
+
+class CredentialBroker:
+    def __init__(self, engine, sts_client, current_account_id, role_name):
+        self.engine = engine
+        self.sts_client = sts_client
+        self.current_account_id = current_account_id
+        self.role_name = role_name
+
+    def role_arn(self, account_id):
+        if account_id == self.current_account_id:
+            return None
+        return f"arn:aws:iam::{account_id}:role/{self.role_name}"
+
+    # Assume role in every account concurrently, returns (AccountSession, error) in account order
+    def prepare(self, account_ids):
+        return self.engine.map(self.account_session, account_ids)
+
+    def account_session(self, account_id):
+        role_arn = self.role_arn(account_id)
+        with _sessions_lock:
+            account_session = _sessions.get(role_arn)
+        if account_session is not None:
+            return account_session
+
+        if role_arn is None:
+            session = boto3.Session()
+        else:
+            session = self._assume_role_session(role_arn)
+        with _sessions_lock:
+            return _sessions.setdefault(role_arn, AccountSession(account_id, session))
+
+    # The credentials refresh themselves shortly before they expire, so the session
+    # and every client built from it stay usable across warm invocations
+    def _assume_role_session(self, role_arn):
+        def refresh():
+            credentials = self.engine.call(
+                'sts',
+                self.sts_client.assume_role,
+                RoleArn=role_arn,
+                RoleSessionName=ROLE_SESSION_NAME
+            )['Credentials']
+            return {
+                'access_key': credentials['AccessKeyId'],
+                'secret_key': credentials['SecretAccessKey'],
+                'token': credentials['SessionToken'],
+                'expiry_time': credentials['Expiration'].isoformat(),
+            }
+
+        credentials = RefreshableCredentials.create_from_metadata(
+            metadata=refresh(),
+            refresh_using=refresh,
+            method='sts-assume-role'
+        )
+        botocore_session = botocore.session.get_session()
+        botocore_session._credentials = credentials
+        return boto3.Session(botocore_session=botocore_session)
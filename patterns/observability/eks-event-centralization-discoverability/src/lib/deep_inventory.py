@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import Future
+
+# Added to every report row when the deep inventory is enabled, so that the
+# columns stay the same for clusters whose deep inventory is not collected yet
+EMPTY = {'nodegroups': [], 'fargateProfiles': [], 'addons': []}
+
+
+# Add-on versions of a region, fetched once with describe_addon_versions and
+# shared by every cluster of the region. Clusters of the same region that ask
+# concurrently wait for the first fetch instead of repeating it.
+class AddonCatalog:
+    def __init__(self, engine):
+        self.engine = engine
+        self._regions = {}
+        self._lock = threading.Lock()
+
+    # Returns addon name to {'latestVersion', 'defaultVersion'} for the Kubernetes version
+    def versions(self, eks, region, kubernetes_version):
+        with self._lock:
+            future = self._regions.get(region)
+            owner = future is None
+            if owner:
+                future = self._regions[region] = Future()
+        if owner:
+            try:
+                future.set_result(self._fetch(eks))
+            except Exception as error:
+                future.set_exception(error)
+        return future.result().get(kubernetes_version, {})
+
+    # Add-on versions are listed newest first, keyed here by Kubernetes version
+    def _fetch(self, eks):
+        catalog = {}
+        for addon in _paginate(self.engine, eks.describe_addon_versions, 'addons'):
+            for addon_version in addon['addonVersions']:
+                for compatibility in addon_version.get('compatibilities', []):
+                    versions = catalog.setdefault(compatibility['clusterVersion'], {}).setdefault(
+                        addon['addonName'], {'latestVersion': addon_version['addonVersion'], 'defaultVersion': None})
+                    if compatibility.get('defaultVersion') and versions['defaultVersion'] is None:
+                        versions['defaultVersion'] = addon_version['addonVersion']
+        return catalog
+
+
+# Managed node groups, Fargate profiles and add-ons of a cluster
+def collect(engine, account_session, row, catalog):
+    eks = account_session.client('eks', row['region'])
+    cluster_name = row['clusterName']
+
+    nodegroups = []
+    for nodegroup_name in _paginate(engine, eks.list_nodegroups, 'nodegroups', clusterName=cluster_name):
+        nodegroup = engine.call('eks', eks.describe_nodegroup, clusterName=cluster_name, nodegroupName=nodegroup_name)['nodegroup']
+        nodegroups.append({
+            'name': nodegroup_name,
+            'status': nodegroup.get('status'),
+            'version': nodegroup.get('version'),
+            'releaseVersion': nodegroup.get('releaseVersion'),
+            'amiType': nodegroup.get('amiType'),
+            'capacityType': nodegroup.get('capacityType'),
+            'instanceTypes': nodegroup.get('instanceTypes', []),
+            'desiredSize': nodegroup.get('scalingConfig', {}).get('desiredSize'),
+        })
+
+    fargate_profiles = []
+    for profile_name in _paginate(engine, eks.list_fargate_profiles, 'fargateProfileNames', clusterName=cluster_name):
+        profile = engine.call('eks', eks.describe_fargate_profile, clusterName=cluster_name, fargateProfileName=profile_name)['fargateProfile']
+        fargate_profiles.append({
+            'name': profile_name,
+            'status': profile.get('status'),
+            'namespaces': sorted({selector['namespace'] for selector in profile.get('selectors', []) if selector.get('namespace')}),
+        })
+
+    addons = []
+    addon_names = list(_paginate(engine, eks.list_addons, 'addons', clusterName=cluster_name))
+    addon_versions = catalog.versions(eks, row['region'], row['clusterVersion']) if addon_names else {}
+    for addon_name in addon_names:
+        addon = engine.call('eks', eks.describe_addon, clusterName=cluster_name, addonName=addon_name)['addon']
+        versions = addon_versions.get(addon_name, {})
+        addons.append({
+            'name': addon_name,
+            'version': addon.get('addonVersion'),
+            'status': addon.get('status'),
+            'latestVersion': versions.get('latestVersion'),
+            'defaultVersion': versions.get('defaultVersion'),
+        })
+
+    return {'nodegroups': nodegroups, 'fargateProfiles': fargate_profiles, 'addons': addons}
+
+
+def _paginate(engine, operation, key, **kwargs):
+    while True:
+        page = engine.call('eks', operation, **kwargs)
+        yield from page[key]
+        if not page.get('nextToken'):
+            break
+        kwargs['nextToken'] = page['nextToken']
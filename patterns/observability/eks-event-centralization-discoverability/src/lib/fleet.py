@@ -0,0 +1,149 @@
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+from lib.inventory import cluster_arn
+
+SCHEMA = """
+CREATE TABLE metadata (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE clusters (
+    cluster_arn TEXT PRIMARY KEY,
+    account_id TEXT,
+    account_name TEXT,
+    region TEXT,
+    cluster_name TEXT,
+    version TEXT,
+    platform_version TEXT,
+    status TEXT,
+    endpoint_public_access INTEGER,
+    endpoint_private_access INTEGER,
+    created_at TEXT,
+    described_at TEXT,
+    tags TEXT
+);
+CREATE TABLE health_events (
+    event_arn TEXT,
+    account_id TEXT,
+    region TEXT,
+    event_type_code TEXT,
+    status_code TEXT,
+    start_time TEXT,
+    description TEXT,
+    received_at TEXT,
+    PRIMARY KEY (event_arn, account_id)
+);
+CREATE TABLE cluster_events (
+    cluster_arn TEXT,
+    event_arn TEXT,
+    account_id TEXT,
+    PRIMARY KEY (cluster_arn, event_arn, account_id)
+);
+CREATE INDEX clusters_version ON clusters (version);
+CREATE INDEX clusters_account ON clusters (account_id);
+CREATE INDEX clusters_region ON clusters (region);
+CREATE INDEX health_events_account ON health_events (account_id);
+CREATE INDEX cluster_events_event ON cluster_events (event_arn, account_id);
+"""
+
+# Named queries of the query CLI, parameters are bound by name
+QUERIES = {
+    'versions': (
+        "Clusters by Kubernetes version",
+        """SELECT version, COUNT(*) AS clusters, COUNT(DISTINCT account_id) AS accounts
+           FROM clusters GROUP BY version ORDER BY version"""
+    ),
+    'pending': (
+        "Clusters on :version with an open lifecycle event, by account",
+        """SELECT c.account_id, c.account_name, COUNT(DISTINCT c.cluster_arn) AS clusters,
+                  GROUP_CONCAT(DISTINCT c.region || '/' || c.cluster_name) AS cluster_names,
+                  MIN(e.start_time) AS earliest_start
+           FROM clusters c
+           JOIN cluster_events ce ON ce.cluster_arn = c.cluster_arn
+           JOIN health_events e ON e.event_arn = ce.event_arn AND e.account_id = ce.account_id
+           WHERE c.version = :version AND COALESCE(e.status_code, 'open') != 'closed'
+           GROUP BY c.account_id, c.account_name ORDER BY clusters DESC"""
+    ),
+    'account': (
+        "Clusters of account :account with their open lifecycle events",
+        """SELECT c.region, c.cluster_name, c.version, COUNT(e.event_arn) AS open_events, MIN(e.start_time) AS earliest_start
+           FROM clusters c
+           LEFT JOIN cluster_events ce ON ce.cluster_arn = c.cluster_arn
+           LEFT JOIN health_events e ON e.event_arn = ce.event_arn AND e.account_id = ce.account_id
+                AND COALESCE(e.status_code, 'open') != 'closed'
+           WHERE c.account_id = :account
+           GROUP BY c.cluster_arn ORDER BY c.region, c.cluster_name"""
+    ),
+    'cluster': (
+        "Lifecycle events of the clusters named :name",
+        """SELECT c.cluster_arn, c.version, e.event_type_code, e.status_code, e.start_time, e.description
+           FROM clusters c
+           JOIN cluster_events ce ON ce.cluster_arn = c.cluster_arn
+           JOIN health_events e ON e.event_arn = ce.event_arn AND e.account_id = ce.account_id
+           WHERE c.cluster_name = :name ORDER BY e.start_time"""
+    ),
+    'undiscovered': (
+        "Clusters with lifecycle events that are missing from the discovery snapshot",
+        """SELECT ce.cluster_arn, ce.account_id, e.event_type_code, e.start_time
+           FROM cluster_events ce
+           JOIN health_events e ON e.event_arn = ce.event_arn AND e.account_id = ce.account_id
+           LEFT JOIN clusters c ON c.cluster_arn = ce.cluster_arn
+           WHERE c.cluster_arn IS NULL ORDER BY ce.account_id, ce.cluster_arn"""
+    ),
+}
+
+
+# Builds the SQLite index at path from a discovery inventory snapshot and the
+# Health events stored by the health events consumer
+def build_index(path, snapshot, events):
+    connection = sqlite3.connect(path)
+    try:
+        connection.executescript(SCHEMA)
+        connection.executemany(
+            "INSERT INTO clusters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (_cluster_values(arn, entry) for arn, entry in snapshot.get('clusters', {}).items()
+             if isinstance(entry, dict) and isinstance(entry.get('row'), dict))
+        )
+        cluster_events = []
+        for event in events:
+            connection.execute(
+                "INSERT OR REPLACE INTO health_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (event['eventArn'], event['accountId'], event.get('region'), event.get('eventTypeCode'),
+                 event.get('statusCode'), event.get('startTime'), event.get('description'), event.get('receivedAt'))
+            )
+            for entity in event.get('clusters') or []:
+                cluster_events.append((_affected_cluster_arn(entity, event), event['eventArn'], event['accountId']))
+        connection.executemany("INSERT OR IGNORE INTO cluster_events VALUES (?, ?, ?)", cluster_events)
+        connection.executemany("INSERT INTO metadata VALUES (?, ?)", [
+            ('builtAt', datetime.now(timezone.utc).isoformat()),
+            ('snapshotGeneratedAt', snapshot.get('generatedAt') or ''),
+        ])
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def run_query(connection, sql, params=None):
+    cursor = connection.execute(sql, params or {})
+    columns = [column[0] for column in cursor.description]
+    return columns, cursor.fetchall()
+
+
+# Rows of snapshots written by an older schema lack some of the columns, which
+# are left empty rather than failing the whole index
+def _cluster_values(arn, entry):
+    row = entry['row']
+    tags = row.get('tags')
+    return (
+        arn, row.get('accountId'), row.get('accountName'), row.get('region'), row.get('clusterName'),
+        row.get('clusterVersion'), row.get('platformVersion'), row.get('status'),
+        row.get('endpointPublicAccess'), row.get('endpointPrivateAccess'), row.get('createdAt'),
+        entry.get('describedAt'), json.dumps(tags if isinstance(tags, dict) else {})
+    )
+
+
+# Affected entities are normally cluster ARNs, plain cluster names are resolved
+# against the account and region of the event
+def _affected_cluster_arn(entity, event):
+    if entity.startswith('arn:'):
+        return entity
+    return cluster_arn(event['accountId'], event.get('region') or '', entity)
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+import botocore
+
+MAX_DESCRIPTION_LENGTH = 2000
+# Items are removed by the table's TTL this long after the last update of their event
+EVENT_RETENTION = timedelta(days=400)
+KEY_ATTRIBUTES = ('eventArn', 'accountId')
+
+
+# Health events received from the central queue, one item per event ARN and
+# account. The conditional update doubles as the dedupe: an event delivered again
+# by SQS or forwarded twice by EventBridge is only stored once, while a later
+# update of the event, such as its status moving from upcoming to open to closed,
+# replaces the stored one. digestedAt is left as is, so an event is digested once.
+class HealthEventStore:
+    def __init__(self, dynamodb_resource, table_name):
+        self.table = dynamodb_resource.Table(table_name)
+
+    # Returns False when the event was already stored with the same or a later update
+    def add(self, item):
+        attributes = {key: value for key, value in item.items() if key not in KEY_ATTRIBUTES}
+        names = {f'#a{index}': key for index, key in enumerate(attributes)}
+        values = {f':a{index}': value for index, value in enumerate(attributes.values())}
+        names['#updated'] = 'lastUpdatedTime'
+        values[':updated'] = item['lastUpdatedTime']
+        try:
+            self.table.update_item(
+                Key={key: item[key] for key in KEY_ATTRIBUTES},
+                UpdateExpression='SET ' + ', '.join(f'#a{index} = :a{index}' for index in range(len(attributes))),
+                ConditionExpression='attribute_not_exists(eventArn) OR attribute_not_exists(#updated) OR #updated < :updated',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values
+            )
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise error
+        return True
+
+    def scan(self, pending_only=False):
+        kwargs = {}
+        if pending_only:
+            kwargs['FilterExpression'] = 'attribute_not_exists(digestedAt)'
+        while True:
+            response = self.table.scan(**kwargs)
+            yield from response['Items']
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    # Only sets digestedAt, so that an update stored since the scan is kept
+    def mark_digested(self, items, digested_at):
+        for item in items:
+            self.table.update_item(
+                Key={key: item[key] for key in KEY_ATTRIBUTES},
+                UpdateExpression='SET digestedAt = :digested',
+                ExpressionAttributeValues={':digested': digested_at}
+            )
+
+
+# Flattens an AWS Health event delivered by EventBridge into a store item
+def event_item(event):
+    detail = event['detail']
+    descriptions = detail.get('eventDescription') or [{}]
+    last_updated = _parse_time(detail.get('lastUpdatedTime') or event.get('time')) or datetime.now(timezone.utc)
+    return {
+        'eventArn': detail['eventArn'],
+        'accountId': event.get('account') or detail.get('affectedAccount'),
+        'region': event.get('region') or detail.get('eventRegion'),
+        'eventTypeCode': detail.get('eventTypeCode'),
+        'statusCode': detail.get('statusCode'),
+        'startTime': detail.get('startTime'),
+        'clusters': sorted({entity['entityValue'] for entity in detail.get('affectedEntities', []) if entity.get('entityValue')}
+                           | set(event.get('resources', []))),
+        'description': descriptions[0].get('latestDescription', '')[:MAX_DESCRIPTION_LENGTH],
+        'receivedAt': datetime.now(timezone.utc).isoformat(),
+        'lastUpdatedTime': last_updated.isoformat(),
+        'expiresAt': int((last_updated + EVENT_RETENTION).timestamp()),
+    }
+
+
+# Health event times are RFC 1123 dates such as "Sat, 05 Jun 2021 15:10:09 GMT",
+# EventBridge times are ISO 8601. Both are normalized to UTC so they compare as strings.
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import botocore
+
+# Bumped whenever the cluster row changes shape, older snapshots are then not reused
+SCHEMA_VERSION = 2
+
+
+class S3InventoryStore:
+    def __init__(self, s3_client, bucket, key):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+
+    # Only a missing inventory, on the first run, is empty. Any other error fails the
+    # run before anything is written, rather than replacing the stored inventory.
+    def load(self):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self.key)
+        except botocore.exceptions.ClientError as error:
+            if error.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return {}
+            raise error
+        return json.loads(response['Body'].read())
+
+    def save(self, snapshot):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=json.dumps(snapshot).encode('utf-8'),
+            ContentType='application/json'
+        )
+
+
+class LocalInventoryStore:
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, snapshot):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'w') as f:
+            json.dump(snapshot, f)
+
+
+# INVENTORY_PATH selects a local file, which is handy when running outside of Lambda
+def open_store(s3_client, bucket):
+    if os.environ.get('INVENTORY_PATH'):
+        return LocalInventoryStore(os.environ['INVENTORY_PATH'])
+    return S3InventoryStore(s3_client, bucket, os.environ.get('INVENTORY_KEY', 'inventory/clusters.json'))
+
+
+def cluster_arn(account_id, region, cluster_name):
+    if region.startswith('cn-'):
+        partition = 'aws-cn'
+    elif region.startswith('us-gov-'):
+        partition = 'aws-us-gov'
+    else:
+        partition = 'aws'
+    return f"arn:{partition}:eks:{region}:{account_id}:cluster/{cluster_name}"
+
+
+def fingerprint(cluster_name, tags):
+    payload = json.dumps([cluster_name, tags or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class Inventory:
+    def __init__(self, snapshot, max_age_hours):
+        self.previous = snapshot.get('clusters', {})
+        self.reusable = snapshot.get('schemaVersion') == SCHEMA_VERSION
+        self.max_age = timedelta(hours=max_age_hours)
+        self.now = datetime.now(timezone.utc)
+
+    # Returns the previous entry when the cluster is unchanged and was described
+    # recently enough, None when it has to be described again
+    def cached(self, arn, cluster_fingerprint):
+        entry = self.previous.get(arn) if self.reusable else None
+        if entry is None or entry['fingerprint'] != cluster_fingerprint:
+            return None
+        if self.now - datetime.fromisoformat(entry['describedAt']) > self.max_age:
+            return None
+        return entry
+
+    def entry(self, row, cluster_fingerprint):
+        return {
+            'row': row,
+            'fingerprint': cluster_fingerprint,
+            'describedAt': self.now.isoformat(),
+        }
+
+    # Builds the new snapshot and the added/removed/changed delta. Clusters of an
+    # active account and region that could not be scanned this run are carried over
+    # as is, as long as the previous snapshot has the same schema.
+    def update(self, entries, scanned, active_accounts):
+        clusters = {}
+        for arn, entry in self.previous.items():
+            row = entry['row']
+            if self.reusable and row['accountId'] in active_accounts and (row['accountId'], row['region']) not in scanned:
+                clusters[arn] = entry
+        clusters.update(entries)
+
+        delta = {'added': [], 'removed': [], 'changed': []}
+        for arn, entry in entries.items():
+            previous = self.previous.get(arn)
+            if previous is None:
+                delta['added'].append(entry['row'])
+            elif previous['row'] != entry['row']:
+                delta['changed'].append({'before': previous['row'], 'after': entry['row']})
+        for arn, entry in self.previous.items():
+            if arn not in clusters:
+                delta['removed'].append(entry['row'])
+
+        snapshot = {'schemaVersion': SCHEMA_VERSION, 'generatedAt': self.now.isoformat(), 'clusters': clusters}
+        return snapshot, delta
@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from lib.scan import THROTTLING_ERROR_CODES
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'EKSDiscovery')
+
+# EMF accepts at most 100 values per metric in a single log line
+MAX_VALUES = 100
+
+
+class ApiStats:
+    def __init__(self):
+        self.calls = 0
+        self.throttles = 0
+        self.retries = 0
+        self.latencies = []
+
+
+# Collects phase timings and per account, region and operation API statistics
+# during a run and prints them as CloudWatch Embedded Metric Format log lines.
+# Clients are instrumented once when they are created and report to the
+# module-level instance below, which is reset at the start of every invocation.
+class Metrics:
+    def __init__(self, namespace=NAMESPACE):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+            self.api = defaultdict(ApiStats)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0) + (time.perf_counter() - start) * 1000
+
+    def instrument(self, client, account_id):
+        region = client.meta.region_name
+        client.meta.events.register('before-call', _before_call)
+        client.meta.events.register('after-call', lambda **kwargs: self._after_call(account_id, region, **kwargs))
+
+    def _after_call(self, account_id, region, parsed, model, context, **kwargs):
+        latency = (time.perf_counter() - context.get('metrics_start', time.perf_counter())) * 1000
+        throttled = parsed.get('Error', {}).get('Code') in THROTTLING_ERROR_CODES
+        retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+        operation = f"{model.service_model.service_id}.{model.name}"
+        with self._lock:
+            for key in (('AccountId', account_id), ('Region', region), ('Operation', operation)):
+                stats = self.api[key]
+                stats.calls += 1
+                stats.throttles += throttled
+                stats.retries += retries
+                stats.latencies.append(latency)
+
+    def emit(self, **properties):
+        with self._lock:
+            phases = dict(self.phases)
+            api = dict(self.api)
+
+        totals = [stats for (dimension, _), stats in api.items() if dimension == 'Operation']
+        run_metrics = {f"{phase}Time": (value, 'Milliseconds') for phase, value in phases.items()}
+        run_metrics['ApiCalls'] = (sum(stats.calls for stats in totals), 'Count')
+        run_metrics['Throttles'] = (sum(stats.throttles for stats in totals), 'Count')
+        run_metrics['Retries'] = (sum(stats.retries for stats in totals), 'Count')
+        self._print({}, run_metrics, properties)
+
+        for (dimension, value), stats in sorted(api.items()):
+            # Latencies are split across several lines so CloudWatch keeps the full distribution
+            for index in range(0, len(stats.latencies), MAX_VALUES):
+                stats_metrics = {'ApiLatency': (stats.latencies[index:index + MAX_VALUES], 'Milliseconds')}
+                if index == 0:
+                    stats_metrics['ApiCalls'] = (stats.calls, 'Count')
+                    stats_metrics['Throttles'] = (stats.throttles, 'Count')
+                    stats_metrics['Retries'] = (stats.retries, 'Count')
+                self._print({dimension: value}, stats_metrics, properties)
+
+    def _print(self, dimensions, values, properties):
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': self.namespace,
+                    'Dimensions': [list(dimensions)],
+                    'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in values.items()],
+                }],
+            },
+        }
+        record.update(properties)
+        record.update(dimensions)
+        record.update({name: value for name, (value, _) in values.items()})
+        print(json.dumps(record))
+
+
+def _before_call(context, **kwargs):
+    context['metrics_start'] = time.perf_counter()
+
+
+metrics = Metrics()
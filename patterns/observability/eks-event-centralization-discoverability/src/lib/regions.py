@@ -0,0 +1,42 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import botocore
+
+
+# Regions enabled in the account itself, describe_regions only returns opted-in
+# regions unless AllRegions is set. None when the call is not permitted.
+def enabled_regions(engine, account_session):
+    ec2 = account_session.client('ec2', os.environ.get('AWS_REGION', 'us-east-1'))
+    try:
+        response = engine.call('ec2', ec2.describe_regions)
+    except botocore.exceptions.ClientError:
+        return None
+    return sorted(region['RegionName'] for region in response['Regions'])
+
+
+# Per account history of the regions scanned by earlier runs. Regions that had
+# clusters or were never checked are always scanned, regions that were empty are
+# only checked again once recheck_hours have passed.
+class RegionIndex:
+    def __init__(self, history, recheck_hours):
+        self.history = history
+        self.recheck = timedelta(hours=recheck_hours)
+        self.now = datetime.now(timezone.utc)
+
+    def regions_to_scan(self, account_id, regions):
+        account_history = self.history.get(account_id, {})
+        selected = []
+        for region in regions:
+            entry = account_history.get(region)
+            if (entry is None
+                    or entry['clusters'] > 0
+                    or self.now - datetime.fromisoformat(entry['lastChecked']) >= self.recheck):
+                selected.append(region)
+        return selected
+
+    def record(self, account_id, region, cluster_count):
+        self.history.setdefault(account_id, {})[region] = {
+            'lastChecked': self.now.isoformat(),
+            'clusters': cluster_count,
+        }
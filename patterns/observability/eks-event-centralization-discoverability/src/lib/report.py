@@ -0,0 +1,186 @@
+import csv
+import gzip
+import io
+import itertools
+import json
+import zipfile
+from datetime import datetime
+
+# pyarrow is only needed for the parquet output format, e.g. from the AWS SDK for pandas Lambda layer
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# S3 requires every part but the last one to be at least 5 MiB
+PART_SIZE = 8 * 1024 * 1024
+
+
+# Non-seekable file object that uploads what is written to it as an S3 multipart
+# upload, holding at most one part in memory. Small objects that never fill a
+# part are uploaded with a single put_object on close.
+class S3MultipartWriter(io.RawIOBase):
+    def __init__(self, s3_client, bucket, key, part_size=PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return len(data)
+
+    def _upload_part(self, body):
+        if self._upload_id is None:
+            self._upload_id = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)['UploadId']
+        part_number = len(self._parts) + 1
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body
+        )
+        self._parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+
+    def close(self):
+        if self.closed:
+            return
+        if self._upload_id is None:
+            self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._upload_part(bytes(self._buffer))
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={'Parts': self._parts}
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# Streams the report rows into a compressed zip archive written to out
+def write_report(out, rows, version_counts):
+    rows = iter(rows)
+    first = next(rows, None)
+    with zipfile.ZipFile(out, mode='w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        with io.TextIOWrapper(zip_file.open('cluster_details.csv', mode='w'), encoding='utf-8', newline='') as cluster_details_csv:
+            if first is not None:
+                cluster_details_writer = csv.DictWriter(cluster_details_csv, fieldnames=first.keys())
+                cluster_details_writer.writeheader()
+                cluster_details_writer.writerow(_csv_row(first))
+                for row in rows:
+                    cluster_details_writer.writerow(_csv_row(row))
+
+        with io.TextIOWrapper(zip_file.open('version_counts.csv', mode='w'), encoding='utf-8', newline='') as version_counts_csv:
+            version_counts_writer = csv.writer(version_counts_csv)
+            version_counts_writer.writerow(['clusterVersion', 'count'])
+            for version, count in version_counts.items():
+                version_counts_writer.writerow([version, count])
+
+
+def _csv_row(row):
+    return {key: json.dumps(value) if isinstance(value, (dict, list)) else value for key, value in row.items()}
+
+
+if pyarrow is not None:
+    PARQUET_SCHEMA = pyarrow.schema([
+        ('snapshotTime', pyarrow.timestamp('us', tz='UTC')),
+        ('accountId', pyarrow.string()),
+        ('accountName', pyarrow.string()),
+        ('region', pyarrow.string()),
+        ('clusterName', pyarrow.string()),
+        ('clusterArn', pyarrow.string()),
+        ('clusterVersion', pyarrow.string()),
+        ('tags', pyarrow.map_(pyarrow.string(), pyarrow.string())),
+        ('platformVersion', pyarrow.string()),
+        ('status', pyarrow.string()),
+        ('endpointPublicAccess', pyarrow.bool_()),
+        ('endpointPrivateAccess', pyarrow.bool_()),
+        ('enabledLogTypes', pyarrow.list_(pyarrow.string())),
+        ('createdAt', pyarrow.timestamp('us', tz='UTC')),
+        # Only set when the deep inventory is enabled
+        ('nodegroups', pyarrow.list_(pyarrow.struct([
+            ('name', pyarrow.string()),
+            ('status', pyarrow.string()),
+            ('version', pyarrow.string()),
+            ('releaseVersion', pyarrow.string()),
+            ('amiType', pyarrow.string()),
+            ('capacityType', pyarrow.string()),
+            ('instanceTypes', pyarrow.list_(pyarrow.string())),
+            ('desiredSize', pyarrow.int64()),
+        ]))),
+        ('fargateProfiles', pyarrow.list_(pyarrow.struct([
+            ('name', pyarrow.string()),
+            ('status', pyarrow.string()),
+            ('namespaces', pyarrow.list_(pyarrow.string())),
+        ]))),
+        ('addons', pyarrow.list_(pyarrow.struct([
+            ('name', pyarrow.string()),
+            ('version', pyarrow.string()),
+            ('status', pyarrow.string()),
+            ('latestVersion', pyarrow.string()),
+            ('defaultVersion', pyarrow.string()),
+        ]))),
+    ])
+
+
+# Writes the rows as a typed Parquet file to out, one row group per batch_size rows
+def write_parquet(out, rows, snapshot_time, batch_size=10000):
+    if pyarrow is None:
+        raise RuntimeError("The parquet output format requires pyarrow, e.g. from the AWS SDK for pandas Lambda layer")
+    with pyarrow.parquet.ParquetWriter(out, PARQUET_SCHEMA, compression='snappy') as writer:
+        rows = iter(rows)
+        while True:
+            batch = [_typed_row(row, snapshot_time) for row in itertools.islice(rows, batch_size)]
+            if not batch:
+                break
+            writer.write_table(pyarrow.Table.from_pylist(batch, schema=PARQUET_SCHEMA))
+
+
+# Writes the rows as gzipped NDJSON, one object per region. open_partition(region)
+# returns the file object of a partition, rows are sorted by region so only one
+# partition is open at a time.
+def write_ndjson(open_partition, rows, snapshot_time):
+    for region, partition_rows in itertools.groupby(sorted(rows, key=lambda row: row['region']), key=lambda row: row['region']):
+        with open_partition(region) as out:
+            with gzip.GzipFile(fileobj=out, mode='wb') as ndjson:
+                for row in partition_rows:
+                    record = dict(row, snapshotTime=snapshot_time.isoformat())
+                    ndjson.write(json.dumps(record).encode('utf-8') + b'\n')
+
+
+def _typed_row(row, snapshot_time):
+    typed = dict(row, snapshotTime=snapshot_time)
+    if isinstance(typed.get('createdAt'), str):
+        typed['createdAt'] = datetime.fromisoformat(typed['createdAt'])
+    return typed
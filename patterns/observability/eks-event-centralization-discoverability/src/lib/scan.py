@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore
+from botocore.config import Config
+
+THROTTLING_ERROR_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'SlowDown',
+}
+
+
+# Raised for tasks that were not started before the deadline of a scan
+class DeadlineExceeded(Exception):
+    pass
+
+
+# Keep the SDK retries short, throttling is handled by the shared per-service backoff below
+CLIENT_CONFIG = Config(retries={'mode': 'standard', 'max_attempts': 2})
+
+
+# Backoff state shared by every worker calling the same AWS service, so that a
+# throttle seen by one worker slows down all the others instead of each one
+# hammering the API on its own schedule
+class ServiceBackoff:
+    def __init__(self, base_delay=0.1, max_delay=5.0):
+        self._lock = threading.Lock()
+        self._delay = 0.0
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+
+    def wait(self):
+        with self._lock:
+            delay = self._delay
+        if delay:
+            time.sleep(random.uniform(delay / 2, delay))
+
+    def throttled(self):
+        with self._lock:
+            self._delay = min(self._max_delay, max(self._base_delay, self._delay * 2))
+
+    def recovered(self):
+        with self._lock:
+            self._delay = self._delay / 2 if self._delay > self._base_delay else 0.0
+
+
+class ScanEngine:
+    def __init__(self, max_workers=32, per_account_workers=4, max_attempts=5):
+        self.max_workers = max_workers
+        self.per_account_workers = per_account_workers
+        self.max_attempts = max_attempts
+        self._backoff = defaultdict(ServiceBackoff)
+        self._backoff_lock = threading.Lock()
+
+    def _service_backoff(self, service):
+        with self._backoff_lock:
+            return self._backoff[service]
+
+    def call(self, service, operation, *args, **kwargs):
+        backoff = self._service_backoff(service)
+        for attempt in range(1, self.max_attempts + 1):
+            backoff.wait()
+            try:
+                response = operation(*args, **kwargs)
+            except botocore.exceptions.ClientError as error:
+                if error.response['Error']['Code'] not in THROTTLING_ERROR_CODES or attempt == self.max_attempts:
+                    raise error
+                backoff.throttled()
+            else:
+                backoff.recovered()
+                return response
+
+    # Run fn over items concurrently, results are returned in the order of items.
+    # Each result is a (value, error) tuple so one failing item does not abort the rest.
+    def map(self, fn, items):
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            futures = [executor.submit(_capture, fn, item) for item in items]
+            return [future.result() for future in futures]
+
+    # Run fn(account, region) for every (account, region) task under the global worker
+    # limit, with at most per_account_workers tasks in flight for the same account.
+    # Results are returned in the order of tasks, whatever order they complete in.
+    # Tasks still queued once time.monotonic() passes deadline fail with DeadlineExceeded.
+    def scan(self, fn, tasks, account_key=lambda account: account, deadline=None):
+        tasks = list(tasks)
+        if not tasks:
+            return []
+        limits = defaultdict(lambda: threading.BoundedSemaphore(self.per_account_workers))
+        for account, _ in tasks:
+            limits[account_key(account)]
+
+        def run(task):
+            account, region = task
+            with limits[account_key(account)]:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise DeadlineExceeded()
+                return fn(account, region)
+
+        # Interleave accounts so that the global workers are spread across accounts
+        # rather than queueing on a single account's limit
+        order = sorted(range(len(tasks)), key=_round_robin_key(tasks, account_key))
+        results = [None] * len(tasks)
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+            futures = {index: executor.submit(_capture, run, tasks[index]) for index in order}
+            for index, future in futures.items():
+                results[index] = future.result()
+        return results
+
+
+def _capture(fn, *args):
+    try:
+        return fn(*args), None
+    except Exception as error:
+        return None, error
+
+
+def _round_robin_key(tasks, account_key):
+    position = defaultdict(int)
+    keys = []
+    for index, (account, _) in enumerate(tasks):
+        key = account_key(account)
+        keys.append((position[key], index))
+        position[key] += 1
+    return lambda index: keys[index]
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import sys
+
+import botocore.exceptions
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from lib.fleet import QUERIES, build_index, run_query
+from lib.health import HealthEventStore, event_item
+
+CLUSTER_ARN = 'arn:aws:eks:us-east-1:111111111111:cluster/prod'
+
+
+# Stands in for the DynamoDB table with the update_item and scan calls of HealthEventStore
+class FakeTable:
+    def __init__(self):
+        self.items = {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ExpressionAttributeNames=None, ConditionExpression=None):
+        names = ExpressionAttributeNames or {}
+        key = (Key['eventArn'], Key['accountId'])
+        current = self.items.get(key)
+        if ConditionExpression and current is not None and 'lastUpdatedTime' in current:
+            if not current['lastUpdatedTime'] < ExpressionAttributeValues[':updated']:
+                raise botocore.exceptions.ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        item = dict(current or Key)
+        for assignment in UpdateExpression[len('SET '):].split(', '):
+            name, value = assignment.split(' = ')
+            item[names.get(name, name)] = ExpressionAttributeValues[value]
+        self.items[key] = item
+
+    def scan(self, **kwargs):
+        return {'Items': [dict(item) for item in self.items.values()]}
+
+
+class FakeDynamoDB:
+    def __init__(self):
+        self.table = FakeTable()
+
+    def Table(self, name):
+        return self.table
+
+
+def health_event(status_code, last_updated_time):
+    return {
+        'account': '111111111111',
+        'region': 'us-east-1',
+        'resources': [CLUSTER_ARN],
+        'detail': {
+            'eventArn': 'arn:aws:health:us-east-1::event/EKS/AWS_EKS_PLANNED_LIFECYCLE_EVENT/1',
+            'eventTypeCode': 'AWS_EKS_PLANNED_LIFECYCLE_EVENT',
+            'statusCode': status_code,
+            'startTime': 'Sat, 05 Jun 2021 15:10:09 GMT',
+            'lastUpdatedTime': last_updated_time,
+        },
+    }
+
+
+def pending_clusters(tmp_path, store):
+    snapshot = {'clusters': {CLUSTER_ARN: {
+        'row': {'accountId': '111111111111', 'accountName': 'prod', 'region': 'us-east-1', 'clusterName': 'prod',
+                'clusterVersion': '1.24', 'tags': {}},
+        'describedAt': '2021-06-05T00:00:00+00:00',
+    }}}
+    path = str(tmp_path / 'fleet.db')
+    if os.path.exists(path):
+        os.remove(path)
+    build_index(path, snapshot, list(store.scan()))
+    connection = sqlite3.connect(path)
+    try:
+        _, rows = run_query(connection, QUERIES['pending'][1], {'version': '1.24'})
+    finally:
+        connection.close()
+    return rows
+
+
+def test_closed_event_leaves_pending(tmp_path):
+    store = HealthEventStore(FakeDynamoDB(), 'events')
+    assert store.add(event_item(health_event('open', 'Sat, 05 Jun 2021 15:10:09 GMT')))
+    assert [row[2] for row in pending_clusters(tmp_path, store)] == [1]
+
+    assert store.add(event_item(health_event('closed', 'Mon, 07 Jun 2021 09:00:00 GMT')))
+    assert pending_clusters(tmp_path, store) == []
+
+
+def test_older_delivery_does_not_reopen_event(tmp_path):
+    store = HealthEventStore(FakeDynamoDB(), 'events')
+    assert store.add(event_item(health_event('closed', 'Mon, 07 Jun 2021 09:00:00 GMT')))
+    assert not store.add(event_item(health_event('open', 'Sat, 05 Jun 2021 15:10:09 GMT')))
+    assert pending_clusters(tmp_path, store) == []